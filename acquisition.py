@@ -0,0 +1,326 @@
+# acquisition.py
+# One asyncio loop, on one background thread, drives every serial device. Each
+# device is a coroutine that reads its port and publishes records into a
+# TelemetryStore. The CAN bus is not on the loop: python-can's Notifier thread
+# decodes each frame into a CanFrameCache as it arrives.
+import asyncio
+import bisect
+import threading
+import time
+from collections import deque
+
+from telemetry import TelemetryStore
+from vedirect import VEDirectParser
+import nmea_fast
+
+# How long a device backs off after an I/O error before trying again
+RETRY_INTERVAL = 1.0 # seconds
+
+# Times CanFrameCache.read() copies a record that changed under it before giving
+# up on that id until the next read
+CAN_READ_RETRIES = 3
+
+
+class Device:
+    """One data source. Subclasses implement run() as a coroutine."""
+
+    def __init__(self, key, status):
+        self.key = key
+        self.status = status  # the DataCapture.connection_status entry for this device
+        self.slot = None      # set by AcquisitionEngine.add()
+        self.task = None      # set by AcquisitionEngine once it is running
+
+    def publish(self, records):
+        for record in records:
+            self.slot.publish(record)
+        if records:
+            self.status.update(ok=True, err=None)
+
+    def fail(self, e):
+        self.status.update(ok=False, err=str(e))
+
+    async def run(self):
+        raise NotImplementedError
+
+
+class SerialDevice(Device):
+    """Polls a non-blocking (timeout=0) pyserial port and hands chunks to handle()."""
+
+    poll_interval = 0.05 # seconds
+
+    def __init__(self, key, ser, status):
+        super().__init__(key, status)
+        self.ser = ser
+
+    def handle(self, chunk):
+        raise NotImplementedError
+
+    async def run(self):
+        while True:
+            try:
+                n = self.ser.in_waiting
+                if n:
+                    self.publish(self.handle(self.ser.read(n)))
+            except Exception as e:
+                self.fail(e)
+                await asyncio.sleep(RETRY_INTERVAL)
+            await asyncio.sleep(self.poll_interval)
+
+
+class VEDirectDevice(SerialDevice):
+    """Charge controllers and the shunt, 19200 baud.
+
+    A device can split its fields over several blocks (the shunt sends V, I,
+    SOC, ... in one and the H1-H18 history in the next), so blocks are merged
+    and every record published is the newest value of every field seen so far.
+    """
+
+    def __init__(self, key, ser, status):
+        super().__init__(key, ser, status)
+        self.parser = VEDirectParser()
+        self.fields = {}
+
+    def handle(self, chunk):
+        records = []
+        for block in self.parser.feed(chunk):
+            self.fields.update(block)
+            records.append(dict(self.fields))  # the store keeps it, so a copy
+        return records
+
+
+class NMEADevice(SerialDevice):
+    """GPS receiver.
+
+    Drains every pending sentence each poll but only keeps the newest RMC, GGA and
+    VTG. One merged fix is published per poll that brought anything new:
+    {'lat', 'lon', 'speed' (km/h), 'hdop', 'quality', 'rx_time'}, where rx_time
+    is the monotonic receive time of the sentence the position came from.
+    """
+
+    poll_interval = 0.02 # seconds, the receiver talks at 115200 baud
+
+    # window for the sentence rate
+    RATE_WINDOW = 5.0 # seconds
+
+    def __init__(self, key, ser, status):
+        super().__init__(key, ser, status)
+        self.buf = bytearray()
+        self.fixes = {}  # sentence type -> (sentence number, rx_time, parsed message)
+        self.arrivals = deque()
+        self.sentences = 0
+        self.ignored = 0  # other sentence types
+        self.dropped = 0  # fix sentences replaced by a newer one before anyone saw them
+        self.garbled = 0  # bad checksum / unparseable
+
+    def handle(self, chunk):
+        now = time.monotonic()
+        self.buf += chunk
+        *lines, rest = bytes(self.buf).split(b'\n')
+        self.buf = bytearray(rest)
+        new = {}
+        for line in lines:
+            if not line.startswith(b'$'):
+                if line.strip():
+                    self.garbled += 1
+                continue
+            self.sentences += 1
+            self.arrivals.append(now)
+            kind = nmea_fast.sentence_type(line)
+            if kind not in nmea_fast.FIX_TYPES:
+                self.ignored += 1  # never parsed
+                continue
+            try:
+                parsed = nmea_fast.parse(line)
+            except ValueError:
+                self.garbled += 1
+                continue
+            if kind in new:
+                self.dropped += 1
+            new[kind] = (self.sentences, now, parsed)
+        while self.arrivals and now - self.arrivals[0] > self.RATE_WINDOW:
+            self.arrivals.popleft()
+        if not new:
+            return []
+        self.fixes.update(new)
+        return [self.merged_fix()]
+
+    def merged_fix(self):
+        fix = {'lat': None, 'lon': None, 'speed': None, 'hdop': None, 'quality': None, 'rx_time': None}
+        # walk oldest to newest so the newest sentence wins each field
+        for n, t, msg in sorted(self.fixes.values(), key=lambda f: f[0]):
+            if isinstance(msg, nmea_fast.RMC) and not msg.valid:
+                continue
+            if isinstance(msg, (nmea_fast.RMC, nmea_fast.GGA)) and msg.lat is not None and msg.lon is not None:
+                fix.update(lat=msg.lat, lon=msg.lon, rx_time=t)
+            if isinstance(msg, nmea_fast.GGA):
+                fix.update(hdop=msg.hdop, quality=msg.quality)
+            if isinstance(msg, (nmea_fast.RMC, nmea_fast.VTG)) and msg.speed is not None:
+                fix['speed'] = msg.speed
+        return fix
+
+    def stats(self):
+        # handle() only prunes when bytes arrive, so a silent receiver would keep its
+        # last rate; count against now instead (a copy, handle() runs on another thread)
+        now = time.monotonic()
+        arrivals = list(self.arrivals)
+        recent = len(arrivals) - bisect.bisect_left(arrivals, now - self.RATE_WINDOW)
+        return {
+            'rate': recent / self.RATE_WINDOW,  # sentences per second
+            'sentences': self.sentences,
+            'ignored': self.ignored,
+            'dropped': self.dropped,
+            'garbled': self.garbled,
+        }
+
+
+class CanFrameCache:
+    """Notifier listener that keeps the newest decoded frame per arbitration id.
+
+    It runs on the python-can Notifier thread: each frame is decoded right away
+    with decoders[arbitration_id] (a can_decoder.MessageDecoder) and stored as
+    latest[arbitration_id] = (rx monotonic time, bus timestamp, name, record, n),
+    replacing the previous one in a single assignment. Readers take whatever is
+    newest; nothing queues up between ticks.
+
+    Records are reused: each id has two and frames alternate between them, so
+    frame n's record is overwritten by frame n + 2. A reader that is pre-empted
+    long enough for that to happen would copy a mix of two frames, so read()
+    checks the id's frame counter before and after copying and copies again if
+    it moved on by two.
+    """
+
+    def __init__(self, decoders):
+        self.decoders = decoders
+        self.records = {can_id: [d.new_record(), d.new_record()] for can_id, d in decoders.items()}
+        self.started = dict.fromkeys(decoders, 0)  # per id: frames whose decode has begun
+        self.latest = {}
+        self.frames = 0    # frames seen
+        self.unknown = 0   # ids with no decoder
+        self.errors = 0    # frames the decoder rejected (too short)
+        self.torn = 0      # copies read() had to redo
+        self.error = None  # last decode or bus error
+
+    def __call__(self, msg):
+        self.frames += 1
+        decoder = self.decoders.get(msg.arbitration_id)
+        if decoder is None:
+            self.unknown += 1
+            return
+        # counted before the record is touched, so read() sees the write coming
+        n = self.started[msg.arbitration_id] = self.started[msg.arbitration_id] + 1
+        try:
+            record = decoder.decode_into(msg.data, self.records[msg.arbitration_id][n & 1])
+        except Exception as e:
+            self.errors += 1
+            self.error = f"{decoder.name}: {e}"
+            return
+        self.latest[msg.arbitration_id] = (time.monotonic(), msg.timestamp, decoder.name, record, n)
+
+    def read(self):
+        """[(rx monotonic time, bus timestamp, name, {signal: value}), ...], newest frame per id.
+
+        Safe to call from any thread; each dict is one whole frame.
+        """
+        frames = []
+        for can_id in list(self.latest):
+            for _ in range(CAN_READ_RETRIES):
+                rx_time, timestamp, name, record, n = self.latest[can_id]
+                values = record.as_dict()
+                if self.started[can_id] - n < 2:
+                    frames.append((rx_time, timestamp, name, values))
+                    break
+                self.torn += 1
+        return frames
+
+    def on_error(self, e):
+        self.error = str(e)
+
+    def stats(self):
+        return {'frames': self.frames, 'unknown': self.unknown, 'errors': self.errors, 'torn': self.torn}
+
+
+class AcquisitionEngine:
+    """Runs all registered devices as tasks on a private event loop thread.
+
+    Devices can be added before start() or while it runs; bring_up() opens a
+    device in a worker thread and adds it once it is open.
+    """
+
+    def __init__(self, store=None):
+        self.store = TelemetryStore() if store is None else store
+        self.devices = {}
+        self.loop = None
+        self.thread = None
+        self.tasks = []
+        self.stopped = None  # future main() waits on until stop()
+
+    def add(self, device):
+        device.slot = self.store.slot(device.key)
+        self.devices[device.key] = device
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.run_device, device)
+        return device
+
+    def latest(self, key):
+        return self.store.latest(key)
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete,
+                                       args=(self.main(),), name="acquisition", daemon=True)
+        self.thread.start()
+
+    def run_device(self, device):
+        if device.task is not None:
+            return  # added from another thread just as main() started
+        def done(task):
+            if not task.cancelled() and task.exception() is not None:
+                device.fail(task.exception())
+        device.task = self.loop.create_task(device.run(), name=device.key)
+        device.task.add_done_callback(done)
+        self.tasks.append(device.task)
+
+    async def main(self):
+        self.stopped = self.loop.create_future()
+        for device in list(self.devices.values()):
+            self.run_device(device)
+        await self.stopped
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def bring_up(self, key, open_device, status, timeout):
+        """Open a device without blocking the caller.
+
+        open_device() runs in a worker thread and returns a Device, or None if
+        there is nothing to run. If it takes longer than timeout seconds the
+        status says so, but the device still joins as soon as it opens.
+        Returns a concurrent.futures.Future of the device.
+        """
+        async def run():
+            opening = self.loop.run_in_executor(None, open_device)
+            try:
+                try:
+                    device = await asyncio.wait_for(asyncio.shield(opening), timeout)
+                except asyncio.TimeoutError:
+                    status.update(ok=False, err=f"Not open after {timeout:g} s, still trying")
+                    device = await opening
+            except Exception as e:
+                status.update(ok=False, err=str(e))
+                return None
+            if device is not None:
+                self.add(device)
+            return device
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def stop(self, timeout=2.0):
+        if self.thread is None:
+            return
+        def cancel():
+            if self.stopped is not None and not self.stopped.done():
+                self.stopped.set_result(None)
+        self.loop.call_soon_threadsafe(cancel)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+        self.thread = None
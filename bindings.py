@@ -0,0 +1,64 @@
+# bindings.py
+# Glue between the telemetry snapshot and the dashboard labels.
+#
+# Each label is bound to a function that formats (text, style, tooltip) from the
+# snapshot. The formatted values are compared with what the label shows already
+# and only the ones that changed are pushed to Qt; setStyleSheet in particular
+# re-polishes the widget, so it should not be called every refresh.
+
+
+class LabelBinding:
+    __slots__ = ('label', 'format', 'text', 'style', 'tooltip')
+
+    def __init__(self, label, format):
+        self.label = label
+        self.format = format  # format(data, status, stats) -> text or (text, style, tooltip)
+        self.text = None      # what the label currently shows
+        self.style = None
+        self.tooltip = None
+
+    def render(self, data, status, stats):
+        """Push whatever changed to the label. Returns how many setters were called."""
+        value = self.format(data, status, stats)
+        text, style, tooltip = (value, None, None) if isinstance(value, str) else value
+        changes = 0
+        if text != self.text:
+            self.label.setText(text)
+            self.text = text
+            changes += 1
+        if style is not None and style != self.style:
+            self.label.setStyleSheet(style)
+            self.style = style
+            changes += 1
+        if tooltip is not None and tooltip != self.tooltip:
+            self.label.setToolTip(tooltip)
+            self.tooltip = tooltip
+            changes += 1
+        return changes
+
+
+class Bindings:
+    """Holds the newest snapshot and renders it on the GUI's own schedule."""
+
+    def __init__(self):
+        self.bindings = []
+        self.pending = None  # (data, status, stats) not yet rendered
+        self.renders = 0
+        self.updates = 0     # widget setters actually called
+
+    def bind(self, label, format):
+        self.bindings.append(LabelBinding(label, format))
+
+    def push(self, data, status, stats):
+        # called for every snapshot; a newer one simply replaces an unrendered one
+        self.pending = (data, status, stats)
+
+    def render(self):
+        """Render the pending snapshot, if any. Returns it (or None)."""
+        if self.pending is None:
+            return None
+        pending, self.pending = self.pending, None
+        for binding in self.bindings:
+            self.updates += binding.render(*pending)
+        self.renders += 1
+        return pending
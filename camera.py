@@ -0,0 +1,221 @@
+# camera.py
+# Camera capture off the GUI thread.
+#
+# Each Camera reads its device on its own thread and keeps only the newest frame;
+# the GUI takes that frame when it redraws, so a stalled camera never blocks the
+# event loop and a slow redraw just skips frames instead of queueing them.
+# CameraView paints the numpy frame through a QImage that shares its buffer.
+import os
+import threading
+import time
+
+import cv2
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QWidget
+
+# DirectShow opens the LattePanda's USB cameras much faster than MSMF
+CAPTURE_API = cv2.CAP_DSHOW if os.name == 'nt' else cv2.CAP_ANY
+
+# name: device index, capture size and frame rate; each gets its own thread
+CAMERAS = {
+    'front': {'index': 1, 'width': 1024, 'height': 720, 'fps': 30},
+    'back':  {'index': 0, 'width': 1024, 'height': 720, 'fps': 30},
+}
+
+# Frames older than this when the GUI gets to them are dropped, not shown
+MAX_FRAME_AGE = 0.5 # seconds
+
+# This many failed reads in a row and the camera is reopened
+MAX_READ_FAILURES = 30
+REOPEN_DELAY = 1.0 # seconds
+
+
+class CameraStats:
+    __slots__ = ('ok', 'err', 'fps', 'latency_ms', 'frames', 'dropped')
+
+    def __init__(self, ok, err, fps, latency_ms, frames, dropped):
+        self.ok = ok                  # delivering frames
+        self.err = err                # last error, if any
+        self.fps = fps                # frames captured per second
+        self.latency_ms = latency_ms  # capture -> taken by the GUI, smoothed
+        self.frames = frames          # frames captured
+        self.dropped = dropped        # frames replaced, or too old, before the GUI took them
+
+
+class Camera:
+    """One capture device read continuously on a background thread."""
+
+    def __init__(self, name, index, width=1024, height=720, fps=None, api=CAPTURE_API, max_age=MAX_FRAME_AGE):
+        self.name = name
+        self.index = index
+        self.width = width
+        self.height = height
+        self.target_fps = fps
+        self.api = api
+        self.max_age = max_age
+
+        self.frame = None     # newest (seq, capture time, ndarray); swapped whole
+        self.seq = 0
+        self.ok = False
+        self.err = None
+        self.fps = 0.0
+        self.running = False
+        self.thread = None
+
+        # consumer side (GUI thread)
+        self.taken = 0        # seq of the last frame taken
+        self.dropped = 0
+        self.latency = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"camera-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def open(self):
+        cap = cv2.VideoCapture(self.index, self.api)
+        if not cap.isOpened():
+            cap.release()
+            raise IOError(f"camera {self.index} did not open")
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.target_fps:
+            cap.set(cv2.CAP_PROP_FPS, self.target_fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # don't let the driver queue old frames either
+        return cap
+
+    def run(self):
+        cap = None
+        failures = 0
+        window_start, window_frames = time.perf_counter(), 0
+        while self.running:
+            if cap is None:
+                try:
+                    cap = self.open()
+                    failures = 0
+                except Exception as e:
+                    self.ok, self.err = False, str(e)
+                    time.sleep(REOPEN_DELAY)
+                    continue
+
+            ret, image = cap.read()
+            now = time.perf_counter()
+            if not ret:
+                failures += 1
+                if failures >= MAX_READ_FAILURES:
+                    self.ok, self.err = False, "no frames, reopening"
+                    cap.release()
+                    cap = None
+                continue
+            failures = 0
+            self.seq += 1
+            self.frame = (self.seq, now, image)
+            self.ok, self.err = True, None
+
+            window_frames += 1
+            if now - window_start >= 1.0:
+                self.fps = window_frames / (now - window_start)
+                window_start, window_frames = now, 0
+        if cap is not None:
+            cap.release()
+
+    def take(self):
+        """The newest frame if it wasn't taken already, else None. One consumer only.
+
+        Frames the GUI never got to, or got to after max_age, count as dropped.
+        """
+        frame = self.frame
+        if frame is None or frame[0] == self.taken:
+            return None
+        seq, t, image = frame
+        self.dropped += seq - self.taken - 1
+        self.taken = seq
+        latency = time.perf_counter() - t
+        if self.max_age is not None and latency > self.max_age:
+            self.dropped += 1
+            return None
+        self.latency = latency if self.latency == 0.0 else 0.9 * self.latency + 0.1 * latency
+        return image
+
+    def latest(self):
+        """The newest frame, taken or not; for readers other than the GUI."""
+        frame = self.frame
+        return None if frame is None else frame[2]
+
+    def stats(self):
+        return CameraStats(self.ok, self.err, self.fps, self.latency * 1000, self.seq, self.dropped)
+
+
+class CameraManager:
+    """All the cameras, each on its own thread, so one failing never stalls another."""
+
+    def __init__(self, cameras=CAMERAS):
+        self.cameras = {name: Camera(name, **config) for name, config in cameras.items()}
+
+    def start(self):
+        for camera in self.cameras.values():
+            camera.start()
+        return self
+
+    def stop(self):
+        for camera in self.cameras.values():
+            camera.running = False
+        for camera in self.cameras.values():
+            camera.stop()
+
+    def take(self):
+        """{name: frame} for every camera with a new frame."""
+        frames = {}
+        for name, camera in self.cameras.items():
+            frame = camera.take()
+            if frame is not None:
+                frames[name] = frame
+        return frames
+
+    def latest(self):
+        """{name: newest frame} without touching the GUI's take() bookkeeping."""
+        frames = {}
+        for name, camera in self.cameras.items():
+            frame = camera.latest()
+            if frame is not None:
+                frames[name] = frame
+        return frames
+
+    def status(self):
+        """{name: CameraStats} for every camera."""
+        return {name: camera.stats() for name, camera in self.cameras.items()}
+
+
+class CameraView(QWidget):
+    """Paints the latest BGR frame, scaled to fit and keeping its aspect ratio."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = None
+        self.frame = None  # keeps the ndarray alive while the QImage points into it
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def set_frame(self, frame):
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = frame.copy()
+        h, w = frame.shape[:2]
+        self.frame = frame
+        self.image = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self.image is not None:
+            size = self.image.size().scaled(self.size(), Qt.KeepAspectRatio)
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(self.rect().center())
+            painter.drawImage(target, self.image)
+        painter.end()
@@ -0,0 +1,104 @@
+# can_batch.py
+# Decode whole CAN logs at once for analysis after a race.
+#
+# Frames are grouped by arbitration id into one contiguous uint8[N, 8] array,
+# viewed through a NumPy structured dtype built from the message's decoder
+# layout (the same slots can_decoder unpacks per frame), and every signal is
+# computed for all rows at once with shifts, masks and scaling.
+#
+#   python can_batch.py motor.blf     # any format python-can's LogReader reads
+import numpy as np
+
+# struct format char -> little-endian NumPy type
+NUMPY_TYPES = {'b': 'i1', 'B': 'u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4', 'q': '<i8', 'Q': '<u8'}
+
+
+def frame_dtype(decoder):
+    """Structured dtype over an 8-byte frame with one field per decoder slot."""
+    return np.dtype({
+        'names': [f'v{i}' for i in range(len(decoder.slots))],
+        'formats': [NUMPY_TYPES[fmt] for _, _, fmt in decoder.slots],
+        'offsets': [offset for offset, _, _ in decoder.slots],
+        'itemsize': 8,
+    })
+
+
+def decode_rows(decoder, rows):
+    """{signal name: column} for rows, a C-contiguous uint8[N, 8] of one message id."""
+    raw = rows.view(frame_dtype(decoder))[:, 0]
+    columns = {}
+    for s, (slot, shift, width, signed) in zip(decoder.signals, decoder.layout):
+        v = raw[f'v{slot}']
+        kind = v.dtype.type
+        whole = shift == 0 and width == v.dtype.itemsize * 8
+        if not whole:
+            v = (v >> kind(shift)) & kind((1 << width) - 1)
+        if signed and (not whole or v.dtype.kind == 'u'):
+            if width == 64:
+                v = v.view(np.int64)
+            else:
+                v = v.astype(np.int64)
+                v = np.where(v >= 1 << (width - 1), v - (1 << width), v)
+        if s.scale != 1:
+            v = v * s.scale
+        if s.bias:
+            v = v + s.bias
+        if s.convert is bool:
+            v = v.astype(bool)
+        elif s.convert is not None:
+            # e.g. bits_set: few distinct values in a log, so convert each once
+            values, inverse = np.unique(v, return_inverse=True)
+            converted = np.empty(len(values), dtype=object)
+            for i, value in enumerate(values.tolist()):
+                converted[i] = s.convert(value)
+            v = converted[inverse.reshape(-1)]
+        columns[s.name] = v
+    return columns
+
+
+def decode_frames(decoders, ids, data, timestamps=None, lengths=None):
+    """{message name: DataFrame} for a log of frames.
+
+    ids: arbitration id per frame; data: uint8[N, 8] (zero-padded); timestamps
+    index the frames (row number if None); lengths: bytes actually received,
+    frames too short for their message are dropped like the per-frame decoder does.
+    """
+    import pandas as pd
+
+    ids = np.asarray(ids)
+    data = np.asarray(data, dtype=np.uint8).reshape(len(ids), 8)
+    times = np.arange(len(ids)) if timestamps is None else np.asarray(timestamps)
+    frames = {}
+    for can_id, decoder in decoders.items():
+        rows = ids == can_id
+        if lengths is not None:
+            rows &= np.asarray(lengths) >= decoder.struct.size
+        if not rows.any():
+            continue
+        columns = decode_rows(decoder, np.ascontiguousarray(data[rows]))
+        frames[decoder.name] = pd.DataFrame(columns, index=pd.Index(times[rows], name='timestamp'))
+    return frames
+
+
+def read_log(path):
+    """(ids, data uint8[N, 8], timestamps, lengths) from any log python-can reads."""
+    import can
+
+    messages = [msg for msg in can.LogReader(path) if not msg.is_error_frame and not msg.is_remote_frame]
+    ids = np.fromiter((msg.arbitration_id for msg in messages), dtype=np.uint32, count=len(messages))
+    timestamps = np.fromiter((msg.timestamp for msg in messages), dtype=np.float64, count=len(messages))
+    lengths = np.fromiter((len(msg.data) for msg in messages), dtype=np.uint8, count=len(messages))
+    payload = b''.join(bytes(msg.data[:8]).ljust(8, b'\0') for msg in messages)
+    data = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 8)
+    return ids, data, timestamps, lengths
+
+
+if __name__ == '__main__':
+    import sys
+
+    from motor_can import decoders
+
+    ids, data, timestamps, lengths = read_log(sys.argv[1])
+    for name, frame in decode_frames(decoders, ids, data, timestamps, lengths).items():
+        print(f"{name}: {len(frame)} frames")
+        print(frame.describe().T)
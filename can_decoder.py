@@ -0,0 +1,188 @@
+# can_decoder.py
+# Compiles CAN message layouts into decoders that unpack a frame in one call.
+#
+# A message is a list of Signals. MessageDecoder turns it into one
+# struct.Struct covering every field the message uses (bitfields share the
+# integer they live in) plus a generated function that applies shifts, masks,
+# sign extension and scaling and writes the results into a record object with
+# __slots__, which the caller reuses frame after frame instead of building a dict.
+#
+# Layouts come from a table in code (see motor_can.MESSAGES) or a DBC file
+# (load_dbc, little-endian signals only).
+import re
+import struct
+from collections import namedtuple
+
+# name: what the record field is called
+# offset, fmt: where the raw integer sits, as a struct format char ('b', 'H', 'Q', ...)
+# bits: (shift, width) to take a bitfield out of that integer, or None for all of it
+# scale, bias: value = raw * scale + bias (left alone when 1 and 0)
+# signed: sign-extend a bitfield
+# convert: optional callable applied last, e.g. bool
+Signal = namedtuple('Signal', 'name offset fmt bits scale bias signed convert',
+                    defaults=(None, 1, 0, False, None))
+
+UNSIGNED = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+class Record:
+    """Base for the generated record types: one slot per signal."""
+
+    __slots__ = ()
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+
+class MessageDecoder:
+    """Decoder for one message id. decode_into(data, record) fills a record in place."""
+
+    def __init__(self, name, signals):
+        self.name = name
+        self.signals = list(signals)
+        self.record_type = type(name, (Record,), {'__slots__': tuple(s.name for s in self.signals)})
+        self.slots, self.layout = slot_layout(self.signals)
+        self.struct, self.decode_into, self.source = build(name, self.signals, self.slots, self.layout)
+        self.record = self.new_record()
+
+    def new_record(self):
+        return self.record_type.__new__(self.record_type)
+
+    def decode(self, data):
+        """Decode into this decoder's own record and return it (overwritten by the next call)."""
+        return self.decode_into(data, self.record)
+
+
+def slot_layout(signals):
+    """Byte slots [offset, size, fmt] to unpack, and per signal (slot index, shift, width, signed).
+
+    Slots that overlap are merged into one wider unsigned integer, and the
+    signals in them become bitfields of it.
+    """
+    slots = []  # [offset, size, fmt]
+    placed = []  # per signal: [slot, shift, width, signed]
+    for s in signals:
+        size = struct.calcsize('<' + s.fmt)
+        width = size * 8 if s.bits is None else s.bits[1]
+        shift = 0 if s.bits is None else s.bits[0]
+        signed = s.fmt.islower() if s.bits is None else s.signed
+        for slot in slots:
+            # an 'h' and an 'H' at the same place get their own slots, merged below
+            # into one unsigned read with the signed field sign-extended
+            if slot[0] == s.offset and slot[1] == size and slot[2] == s.fmt:
+                break
+        else:
+            slot = [s.offset, size, s.fmt]
+            slots.append(slot)
+        placed.append([slot, shift, width, signed])
+
+    merged = True
+    while merged:
+        merged = False
+        for a in slots:
+            for b in slots:
+                if a is b or a[0] + a[1] <= b[0] or b[0] + b[1] <= a[0]:
+                    continue
+                start, end = min(a[0], b[0]), max(a[0] + a[1], b[0] + b[1])
+                size = next(n for n in (1, 2, 4, 8) if n >= end - start)
+                start = min(start, 8 - size)  # keep the integer inside an 8-byte frame, like dbc_signal
+                union = [start, size, UNSIGNED[size]]
+                for p in placed:
+                    if p[0] is a or p[0] is b:
+                        old = p[0]
+                        p[0] = union
+                        p[1] += 8 * (old[0] - start)
+                slots = [s for s in slots if s is not a and s is not b] + [union]
+                merged = True
+                break
+            if merged:
+                break
+
+    slots.sort(key=lambda slot: slot[0])
+    layout = [(slots.index(slot), shift, width, signed) for slot, shift, width, signed in placed]
+    return slots, layout
+
+
+def build(name, signals, slots, layout):
+    fmt, pos = '<', 0
+    for offset, size, char in slots:
+        fmt += 'x' * (offset - pos) + char
+        pos = offset + size
+    unpacker = struct.Struct(fmt)
+    if unpacker.size > 8:
+        raise ValueError(f"{name}: layout needs {unpacker.size} bytes, more than a CAN frame")
+
+    names = [f'v{i}' for i in range(len(slots))]
+    lines = [f"def decode_into(data, record):",
+             f"    {', '.join(names)}, = unpack_from(data)"]
+    namespace = {'unpack_from': unpacker.unpack_from}
+    for i, (s, (slot, shift, width, signed)) in enumerate(zip(signals, layout)):
+        slot_offset, slot_size, slot_fmt = slots[slot]
+        expr = names[slot]
+        whole = shift == 0 and width == slot_size * 8
+        if not whole:
+            expr = f"({expr} >> {shift}) & {(1 << width) - 1:#x}" if shift else f"{expr} & {(1 << width) - 1:#x}"
+        if signed and (not whole or slot_fmt.isupper()):
+            # the slot was read unsigned; sign-extend the field
+            lines.append(f"    x = {expr}")
+            lines.append(f"    if x >= {1 << (width - 1)}: x -= {1 << width}")
+            expr = "x"
+        if s.scale != 1:
+            expr = f"({expr}) * {s.scale!r}"
+        if s.bias:
+            expr = f"{expr} + {s.bias!r}"
+        if s.convert is not None:
+            namespace[f'convert{i}'] = s.convert
+            expr = f"convert{i}({expr})"
+        lines.append(f"    record.{s.name} = {expr}")
+    lines.append("    return record")
+    source = "\n".join(lines)
+    exec(compile(source, f"<can decoder {name}>", 'exec'), namespace)
+    return unpacker, namespace['decode_into'], source
+
+
+def compile_messages(messages):
+    """{arbitration id: (name, [Signal, ...])} -> {arbitration id: MessageDecoder}"""
+    return {can_id: MessageDecoder(name, signals) for can_id, (name, signals) in messages.items()}
+
+
+# SG_ name : start|length@byteorder+/- (scale,offset) [min|max] "unit" receivers
+DBC_MESSAGE = re.compile(r'^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)')
+DBC_SIGNAL = re.compile(r'^\s*SG_\s+(\w+)\s*(?:\w+\s*)?:\s*(\d+)\|(\d+)@([01])([+-])\s*\(([^,]+),([^)]+)\)')
+
+
+def dbc_signal(name, start, length, signed, scale, bias):
+    # byte-aligned 8/16/32/64-bit signals unpack directly; anything else is a
+    # bitfield of the smallest aligned integer that holds it
+    if start % 8 == 0 and length in (8, 16, 32, 64):
+        char = UNSIGNED[length // 8]
+        return Signal(name, start // 8, char.lower() if signed else char, None, scale, bias)
+    first, last = start // 8, (start + length - 1) // 8
+    size = next(n for n in (1, 2, 4, 8) if n >= last - first + 1)
+    first = min(first, 8 - size)  # keep the integer inside an 8-byte frame
+    return Signal(name, first, UNSIGNED[size], (start - 8 * first, length), scale, bias, signed)
+
+
+def load_dbc(path):
+    """{arbitration id: (name, [Signal, ...])} from a DBC file's BO_/SG_ lines."""
+    messages = {}
+    current = None
+    with open(path, encoding='latin-1') as f:
+        for line in f:
+            m = DBC_MESSAGE.match(line)
+            if m:
+                can_id = int(m.group(1)) & 0x1FFFFFFF  # bit 31 only marks extended ids
+                current = messages[can_id] = (m.group(2), [])
+                continue
+            m = DBC_SIGNAL.match(line)
+            if m and current is not None:
+                name, start, length, order, sign, scale, bias = m.groups()
+                if order == '0':
+                    raise ValueError(f"{name}: big-endian (Motorola) signals are not supported")
+                scale, bias = float(scale), float(bias)
+                current[1].append(dbc_signal(name, int(start), int(length), sign == '-',
+                                             1 if scale == 1 else scale, 0 if bias == 0 else bias))
+    return {can_id: message for can_id, message in messages.items() if message[1]}
@@ -0,0 +1,95 @@
+# charts.py
+# Strip charts of the last few minutes of a HistoryStore channel.
+#
+# However many samples are in the window, they are reduced to one min/max pair
+# per pixel column before drawing, so the painter never draws more than two
+# points per column and spikes between columns still show.
+import numpy as np
+from PyQt5.QtCore import QPointF, Qt
+from PyQt5.QtGui import QColor, QFont, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QWidget
+
+# How far back a chart looks by default
+CHART_SECONDS = 300.0 # 5 minutes
+
+
+def decimate(t, v, t0, t1, width):
+    """Reduce samples in [t0, t1] to per-column (x, lo, hi) over `width` columns.
+
+    t must be sorted. NaN samples are ignored; a column with only NaNs comes out NaN.
+    """
+    if not len(t) or t1 <= t0 or width < 1:
+        empty = np.empty(0)
+        return empty.astype(np.intp), empty, empty
+    cols = ((t - t0) * (width / (t1 - t0))).astype(np.intp)
+    np.clip(cols, 0, width - 1, out=cols)
+    # the first sample of every run of equal columns
+    starts = np.flatnonzero(np.concatenate(([True], cols[1:] != cols[:-1])))
+    return cols[starts], np.fmin.reduceat(v, starts), np.fmax.reduceat(v, starts)
+
+
+class StripChart(QWidget):
+    """One channel of a HistoryStore over the last `seconds`, newest on the right."""
+
+    def __init__(self, history, channel, title, unit='', scale=1.0, seconds=CHART_SECONDS,
+                 color='orange', parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.channel = channel
+        self.title = title
+        self.unit = unit
+        self.scale = scale  # applied to the stored values, e.g. km/h -> mph
+        self.seconds = seconds
+        self.pen = QPen(QColor(color), 1)
+        self.font = QFont('Arial', 9)
+        self.setMinimumSize(240, 70)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(20, 20, 20))
+        painter.setFont(self.font)
+        painter.setPen(Qt.white)
+
+        width, height = self.width(), self.height()
+        # a copy: the data worker keeps appending on its own thread
+        t, v = self.history.window(self.channel, seconds=self.seconds, copy=True)
+        if not len(t):
+            painter.drawText(4, 14, self.title)
+            painter.end()
+            return
+        t1 = t[-1]
+        x, lo, hi = decimate(t, v, t1 - self.seconds, t1, width)
+        lo, hi = lo * self.scale, hi * self.scale
+
+        latest = v[-1] * self.scale
+        painter.drawText(4, 14, f"{self.title}: {latest:.1f} {self.unit}" if latest == latest else self.title)
+        ok = ~np.isnan(lo)
+        if not ok.any():
+            painter.end()
+            return
+
+        # y range from what is on screen, with a little headroom
+        bottom, top = float(lo[ok].min()), float(hi[ok].max())
+        pad = (top - bottom) * 0.1 or 1.0
+        bottom, top = bottom - pad, top + pad
+        margin = 18  # leave the title row alone
+        span = height - margin - 2
+        ylo = (height - 2) - (lo - bottom) / (top - bottom) * span
+        yhi = (height - 2) - (hi - bottom) / (top - bottom) * span
+
+        painter.drawText(width - 70, 14, f"{bottom:.0f} - {top:.0f}")
+        painter.setPen(self.pen)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        # one polyline per run of columns with data; a NaN column breaks the line
+        points = []
+        for xi, y0, y1, good in zip(x.tolist(), ylo.tolist(), yhi.tolist(), ok.tolist()):
+            if not good:
+                if points:
+                    painter.drawPolyline(QPolygonF(points))
+                    points = []
+                continue
+            points.append(QPointF(xi, y0))
+            points.append(QPointF(xi, y1))
+        if points:
+            painter.drawPolyline(QPolygonF(points))
+        painter.end()
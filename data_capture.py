@@ -1,10 +1,20 @@
 # data_capture.py
+import os
 import serial
 import time
-import re
+from concurrent.futures import wait
 
 # from telemetrix import telemetrix
-from pynmeagps import NMEAReader
+
+from acquisition import AcquisitionEngine, VEDirectDevice, NMEADevice, CanFrameCache
+from telemetry import SnapshotBuffer
+from history import HistoryStore
+from telemetry_log import TelemetryLog
+from serial_replay import CaptureWriter, RecordingSerial
+from gps_config import configure_receiver
+from track import LapDetector, DistanceIntegrator
+import startup
+import motor_can
 
 
 #physical constants
@@ -28,17 +38,73 @@ CB_TIME = 3
 # GPS counter range ((x0,y0),(x1,y1))
 GPS_BOUNDS = ((33.03467, -97.28418), (33.03450, -97.28480)) #((33.03467, -97.28418), (33.03458, -97.28470))
 
+# Start/finish line as a directed segment (see track.LapDetector for which way
+# counts). Until it is surveyed on the course, the diagonal of the old start box.
+FINISH_LINE = GPS_BOUNDS
+# Set once FINISH_LINE is surveyed with A->B the right way round for the racing
+# direction; until then crossings in both directions count
+FINISH_LINE_SURVEYED = False
+
+# Where each device is plugged in: key -> (port or pyserial URL, baud rate).
+# URLs such as socket://host:port work too, for network stand-ins.
+PORTS = {
+    'solar1': ('COM4', 19200),
+    'solar2': ('COM10', 19200),
+    'gps': ('COM12', 115200),
+    'battery': ('COM3', 19200),
+}
+
+# What reads each port on the acquisition loop
+DEVICE_TYPES = {
+    'solar1': VEDirectDevice,
+    'solar2': VEDirectDevice,
+    'gps': NMEADevice,
+    'battery': VEDirectDevice,
+}
+
+# Motor controller frames older than this are dropped from the snapshot
+MOTOR_STALE = 2.0 # seconds
+
+# Ports are opened in parallel; one that takes longer than this is reported as
+# not open yet (it still joins when it does open)
+OPEN_TIMEOUT = 3.0 # seconds
+
+# A GPS fix older than this is treated as "no gps data"
+GPS_STALE = 3.0 # seconds
+
+# Channels kept in the history store for trends and lap stats
+HISTORY_CHANNELS = (
+    'speed', 'distance', 'temperature', 'battery', 'battery_I', 'lap',
+    'V', 'I', 'I_1', 'I_2', 'PPV', 'PPV_1', 'PPV_2', 'lat', 'lon',
+)
+
+# On-disk telemetry log, one segment series per group
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+LOG_GROUPS = {
+    'solar': ('V', 'I_1', 'I_2', 'PPV_1', 'PPV_2'),
+    'battery': ('battery', 'battery_I'),
+    'gps': ('lat', 'lon', 'speed'),
+    'race': ('time', 'distance', 'lap', 'temperature'),
+}
+
 class DataCapture:
-    def __init__(self):
+    def __init__(self, open_port=None, capture_dir=None):
+        # open_port(key, port, baudrate) -> serial-like object, e.g. serial_replay.Replay.open_port
+        self.port_opener = open_port
+        # if set, the raw bytes from every port are recorded there for later replay
+        self.capture_dir = capture_dir
+        if capture_dir is not None:
+            os.makedirs(capture_dir, exist_ok=True)
+
         self.start_time = time.time()
-        self.gps_prev_t = time.time()
+        self.start_monotonic = time.monotonic()  # history timestamps; the wall clock can step when it syncs
 
         self.encoder = False
         self.prev_encoder = False
         self.rotation = 0
 
         #data that will be displayed
-        self.data = {
+        self.buffer = SnapshotBuffer({
             "speed": 0.0,
             "distance": 0.0,
             "temperature": 0,
@@ -46,6 +112,7 @@ class DataCapture:
             "battery": 0,
             "battery_I": 0,
             "lap": 0,
+            "lap_time": None,
             'V': 0,
             'I': 0,
             "I_1": 0,
@@ -54,17 +121,39 @@ class DataCapture:
             "PPV_2": 0,
             'PPV': 0,
             "gps": [0,0],
-            "gps_bounds": GPS_BOUNDS
-        }
+            "gps_bounds": GPS_BOUNDS,
+            "gps_stats": {},
+            "motor": {},
+            "age": {},
+        })
+
+        # the update_* methods fill in the back buffer, get_data() publishes it
+        self.data = self.buffer.back
 
-        self.prev_data = self.data
+        # every published tick, for rolling averages / min / max over a lap
+        self.history = HistoryStore(HISTORY_CHANNELS)
+
+        try:
+            self.log = TelemetryLog(LOG_DIR, LOG_GROUPS)
+        except OSError as e:
+            self.log = None
+            print(f"Telemetry log disabled: {e}")
+
+        # when each field in self.data was last refreshed from a device (monotonic)
+        self.field_times = {}
+        self.gps_applied = None  # publish time of the last gps fix used
+        self.position_time = None # rx_time of the newest position handed to laps/distance
+        self.gps_positions = []   # (rx_time, lat, lon, hdop, speed) that arrived this tick
+        self.laps = LapDetector(FINISH_LINE, both_ways=not FINISH_LINE_SURVEYED)
+        if not FINISH_LINE_SURVEYED:
+            print("Finish line not surveyed: counting laps in both directions.")
+        self.distancer = DistanceIntegrator()
 
         # self.board = None
-        self.solar_panel_1_serial = None
-        self.solar_panel_2_serial = None
-        self.gps_serial = None
-        self.gps_reader = None
-        self.battery_serial = None
+        self.serials = {}   # key -> open port, filled in as the ports come up
+        self.opening = {}   # key -> future of the device being brought up
+        self.stopping = False
+        self.gps_mode = None
 
         # self.board_setup()
         # self.dht_setup(self.board, DHT_PIN, self.dht_callback, 11)
@@ -76,24 +165,110 @@ class DataCapture:
             'solar2':    {'ok': False, 'err': None},
             'gps':       {'ok': False, 'err': None},
             'battery':   {'ok': False, 'err': None},
+            'motor':     {'ok': False, 'err': None},
         }
 
-        self.solar_panel_serial_setup()
-        self.gps_setup()
-        self.battery_serial_setup()
-
-
-    def battery_serial_setup(self):
-        try:
-            self.battery_serial = serial.Serial('COM3', 19200, timeout=0)
-            self.connection_status['battery']['ok'] = True
-        except Exception as e:
-            self.battery_serial = None
-            self.connection_status['battery'].update(ok=False, err=str(e))
+        # motor controller: decoded on the python-can Notifier thread, newest frame per id
+        self.motor_bus = None
+        self.motor_notifier = None
+        self.motor_frames = CanFrameCache(motor_can.decoders)
+
+        # every open port is read by the acquisition loop, the GUI tick never touches I/O;
+        # the ports open in the background, so nothing here waits on a slow device
+        self.engine = AcquisitionEngine()
+        self.start_acquisition()
+
+    def open_device(self, key):
+        # runs in a worker thread, one per port, all at once
+        ser = self.open_port(key)
+        if key == 'gps':
+            self.gps_setup(ser)
+        if self.stopping:
+            ser.close()
+            return None
+        self.serials[key] = ser
+        self.connection_status[key].update(ok=True, err=None)
+        startup.mark(f"{key} open")
+        return DEVICE_TYPES[key](key, ser, self.connection_status[key])
+
+    def open_port(self, key):
+        port, baudrate = PORTS[key]
+        if self.port_opener is not None:
+            ser = self.port_opener(key, port, baudrate)
+        else:
+            ser = serial.serial_for_url(port, baudrate, timeout=0)
+        if self.capture_dir is not None:
+            ser = RecordingSerial(ser, CaptureWriter(os.path.join(self.capture_dir, key + '.cap')))
+        return ser
+
+    def start_acquisition(self):
+        self.engine.start()
+        for key in PORTS:
+            self.opening[key] = self.engine.bring_up(key, lambda key=key: self.open_device(key),
+                                                     self.connection_status[key], OPEN_TIMEOUT)
+        self.opening['motor'] = self.engine.bring_up('motor', self.open_motor,
+                                                     self.connection_status['motor'], OPEN_TIMEOUT)
+
+    def open_motor(self):
+        # runs in a worker thread like open_device; the Notifier then owns the bus
+        import can  # only needed once there is a CAN adapter to talk to
+
+        bus = can.Bus(**motor_can.CAN_BUS)
+        if self.stopping:
+            bus.shutdown()
+            return None
+        self.motor_bus = bus
+        self.motor_notifier = can.Notifier(bus, [self.motor_frames])
+        self.connection_status['motor'].update(ok=True, err=None)
+        startup.mark("motor open")
+        return None  # nothing for the acquisition loop to run
+
+    def wait_ready(self, timeout=None):
+        """Block until every port has opened or failed. Only scripts need this."""
+        wait(self.opening.values(), timeout)
+
+    def stop(self):
+        self.stopping = True
+        self.engine.stop()
+        for ser in list(self.serials.values()):
+            ser.close()
+        if self.motor_notifier is not None:
+            self.motor_notifier.stop()
+        if self.motor_bus is not None:
+            self.motor_bus.shutdown()
+        if self.log is not None:
+            self.log.close()
+
+    def latest(self, key):
+        return self.engine.latest(key)
+
+    def set_field(self, field, value, t):
+        self.data[field] = value
+        self.field_times[field] = t
+
+    @property
+    def prev_data(self):
+        # last published tick; read-only, so deltas against it are never zero by accident
+        return self.buffer.current
 
     def get_data(self):
         self.update_data()
-        return self.data
+        now = time.monotonic()
+        self.data["age"] = {field: now - t for field, t in self.field_times.items()}
+        snapshot = self.buffer.publish()
+        self.record(snapshot)
+        return snapshot
+
+    def record(self, snapshot):
+        values = snapshot.as_dict()
+        values['lat'], values['lon'] = snapshot.gps
+        # seconds since start on the monotonic clock, so the column stays sorted
+        self.history.append(time.monotonic() - self.start_monotonic, values)
+        if self.log is not None:
+            try:
+                self.log.write(time.time(), values)
+            except OSError as e:
+                print(f"Failed to write telemetry log: {e}")
 
     def update_data(self):
         #order matters
@@ -101,37 +276,28 @@ class DataCapture:
         # self.update_speed()
         self.update_solar_panel()
         self.update_gps()
+        self.update_lap()
         self.update_distance()
 
         self.update_battery()
+        self.update_motor()
     
     def update_time(self):
         t = time.time() - self.start_time
-        self.prev_data["time"] = self.data["time"]
         self.data["time"] = t
         return
     
     def update_distance(self):
-        # Ensure the required keys are present in both data dictionaries
-        if "distance" not in self.data or "time" not in self.data or "speed" not in self.data:
-            print("Missing data in self.data")
+        # haversine over the new fixes; speed x dt drifted and counted while parked
+        if not self.gps_positions:
             return
-
+        times, lats, lons, hdops, speeds = zip(*self.gps_positions)
         try:
-            # Calculate the new distance
-            time_difference = (self.data["time"] - self.prev_data["time"]) / 3600.0  # Convert seconds to hours
-            distance = self.data["distance"] + time_difference * self.data["speed"]  # km
-
-            # Update distances
-            self.data["distance"] = distance
-
-            print(f"Calculated time delta: {time_difference}")
-            print(f"Calculated distance: {distance}")
+            self.distancer.update(times, lats, lons, hdops, speeds)
+            self.set_field("distance", self.distancer.distance / 1000, times[-1])  # km
         except Exception as e:
             print(f"Failed to update distance: {e}")
 
-        return
-
     
     # def update_speed(self):
     #     dt = self.data["time"] - self.prev_data["time"]
@@ -155,141 +321,124 @@ class DataCapture:
     #             print(f"Connection failed with error: {e}. Retrying...")
     #             time.sleep(1)  # Wait a bit before retrying to avoid spamming connection attempts
 
-    def solar_panel_serial_setup(self):
-        try:
-            self.solar_panel_1_serial = serial.Serial('COM4', 19200)
-            self.connection_status['solar1']['ok'] = True
-        except Exception as e:
-            self.solar_panel_1_serial = None
-            self.connection_status['solar1'].update(ok=False, err=str(e))
-
-        try:
-            self.solar_panel_2_serial = serial.Serial('COM10', 19200)
-            self.connection_status['solar2']['ok'] = True
-        except Exception as e:
-            self.solar_panel_2_serial = None
-            self.connection_status['solar2'].update(ok=False, err=str(e))
-
-    def read_serial_data(self, ser, key):
-        data = {}
-        try:
-            iterations = 0
-            while ser.in_waiting and iterations < 10:
-                line = ser.readline().decode('latin-1').strip()
-                if line:
-                    # Split the line based on any whitespace or common delimiters
-                    parts = re.split(r'[\t,;| ]+', line)
-                    if len(parts) == 2:
-                        line_key = parts[0]
-                        line_value = parts[1]
-                        data[line_key] = line_value
-                    else:
-                        print(f"Line format error: Not enough parts - Line: {line}")
-                iterations += 1
-            ser.reset_input_buffer()  # Clear the buffer after reading       
-            self.connection_status[key].update(ok=True, err=None)
-        except Exception as e:
-            self.connection_status[key].update(ok=False, err=str(e))
-        return data
-    
     def update_solar_panel(self):
-        data1 = self.read_serial_data(self.solar_panel_1_serial, 'solar1')
-        data2 = self.read_serial_data(self.solar_panel_2_serial, 'solar2')
-
-        print("Solar panel: ")
-        print(data1)
-        print(data2)
+        latest1 = self.latest('solar1')
+        latest2 = self.latest('solar2')
 
         # Combine the data
         try:
-            if "V" in data1:
-                self.data['V'] = float(data1['V'])  # V should be the same for both panels
-            if "V" in data2:
-                self.data['V'] = float(data2['V'])  # V should be the same for both panels
-
-            if "I" in data1:
-                self.data['I_1'] = float(data1['I'])
-            if "I" in data2:
-                self.data['I_2'] = float(data2['I'])
-            self.data["I"] = self.data["I_1"] + self.data["I_2"]
+            for latest, suffix in ((latest1, '_1'), (latest2, '_2')):
+                if latest is None:
+                    continue
+                t, data = latest
+                if "V" in data:
+                    self.set_field('V', float(data['V']), t)  # V should be the same for both panels
+                if "I" in data:
+                    self.set_field('I' + suffix, float(data['I']), t)
+                if "PPV" in data:
+                    self.set_field('PPV' + suffix, float(data['PPV']), t)
 
-            if "PPV" in data1:
-                self.data['PPV_1'] = float(data1['PPV'])
-            if "PPV" in data2:
-                self.data['PPV_2'] = float(data2['PPV'])
+            self.data["I"] = self.data["I_1"] + self.data["I_2"]
             self.data['PPV'] = self.data['PPV_1'] + self.data['PPV_2']
+            for field in ('I', 'PPV'):
+                times = [self.field_times[f] for f in (field + '_1', field + '_2') if f in self.field_times]
+                if times:
+                    self.field_times[field] = min(times)
 
         except Exception as e:
             print(f"Failed to update solar panel data: {e}")
 
-    def gps_setup(self):
+    def gps_setup(self, ser):
+        # ask for 10 Hz RMC+GGA; a receiver that refuses just keeps its defaults
         try:
-            self.stream = serial.Serial('COM12', 115200, timeout=0)
-            self.gps_reader = NMEAReader(self.stream)
-            self.connection_status['gps']['ok'] = True
+            self.gps_mode = configure_receiver(ser)
         except Exception as e:
-            self.stream = None
-            self.gps_reader = None
-            self.connection_status['gps'].update(ok=False, err=str(e))
+            self.gps_mode = f"defaults ({e})"
+        print("GPS receiver: " + self.gps_mode)
 
     def update_gps(self):
-        raw_data, parsed_data = self.gps_reader.read()
-        if parsed_data is not None:
-            try:
-                # print(raw_data)
-                if hasattr(parsed_data, 'lat'):
-                    print("lat: " + str(parsed_data.lat)) 
-                    print("long: " + str(parsed_data.lon))
-                    self.data["gps"] = [parsed_data.lat, parsed_data.lon]
-                    self.connection_status['gps'].update(ok=True, err=None)
-                else:
-                    self.connection_status['gps'].update(ok=False, err="Parsed data does not contain lat or lon attributes.")
-                    print("Parsed data does not contain lat or long attributes.")
-
-                if  hasattr(parsed_data, 'spd'):
-                    print("spd: " + str(parsed_data.spd))
-                    if parsed_data.spd != 0.0:
-                        self.data["speed"] = parsed_data.spd * 1.852 # km/h
-                else:
-                    self.connection_status['gps'].update(ok=False, err="Parsed data does not contain spd attribute.")
-                    print("Parsed data does not contain spd attribute.")
-            except Exception as e:
-                self.connection_status['gps'].update(ok=False, err=str(e))
-                print(f"Failed to update gps data: {e}")
-        else:
-            self.connection_status['gps'].update(ok=False, err="No GPS data received.")
+        latest = self.latest('gps')
+        if latest is None or time.monotonic() - latest[0] >= GPS_STALE:
+            # until the port is open, the status says why it isn't (see open_device)
+            if 'gps' in self.serials:
+                self.connection_status['gps'].update(ok=False, err="No GPS data received.")
             print("No gps message.")
-            pass
-
-        #update lap
-        if time.time() - self.gps_prev_t > 20 and self.data["gps"] != ['', '']:
-            pos = self.data["gps"]
-            #check if we are in the starting area
-            if GPS_BOUNDS[0][0] > pos[0] > GPS_BOUNDS[1][0] and GPS_BOUNDS[0][1] > pos[1] > GPS_BOUNDS[1][1]: #check for x and check for y
-                self.data["lap"] += 1
-                self.gps_prev_t = time.time()
-                print("Lap detected. Reseting timer to:" + str(self.gps_prev_t))
-
-    def battery_serial_setup(self):
-        try:
-            self.battery_serial = serial.Serial('COM3', 19200, timeout=0)
-            self.connection_status['battery']['ok'] = True
-        except Exception as e:
-            self.battery_serial = None
-            self.connection_status['battery'].update(ok=False, err=str(e))
 
-    
+        # every fix since the last tick, not just the newest, so no lap crossing is missed
+        new = self.engine.store.since('gps', self.gps_applied)
+        self.gps_positions = self.new_positions([f for _, f in new])
+        if new:
+            self.gps_applied = new[-1][0]
+            t, fix = new[-1]
+            if fix['lat'] is not None:
+                print("lat: " + str(fix['lat']))
+                print("long: " + str(fix['lon']))
+                self.set_field("gps", [fix['lat'], fix['lon']], fix['rx_time'])
+                self.connection_status['gps'].update(ok=True, err=None)
+            else:
+                self.connection_status['gps'].update(ok=False, err="Receiver has no position fix.")
+                print("No gps fix.")
+
+            if fix['speed'] is not None:
+                print("spd: " + str(fix['speed']))
+                self.set_field("speed", fix['speed'], t) # km/h
+
+        gps = self.engine.devices.get('gps')
+        if gps is not None:
+            self.data["gps_stats"] = gps.stats()
+
+    def new_positions(self, fixes):
+        # a fix is republished when only its speed changed, skip those repeats
+        last = self.position_time
+        positions = []
+        for fix in fixes:
+            if fix['lat'] is not None and (last is None or fix['rx_time'] > last):
+                positions.append((fix['rx_time'], fix['lat'], fix['lon'], fix['hdop'], fix['speed']))
+                last = fix['rx_time']
+        self.position_time = last
+        return positions
+
+    def update_lap(self):
+        if not self.gps_positions:
+            return
+        times, lats, lons, _, _ = zip(*self.gps_positions)
+        for crossing in self.laps.update(times, lats, lons):
+            print(f"Lap detected at {crossing:.2f}")
+        self.data["lap"] = self.laps.laps
+        if self.laps.laps > 1:
+            self.data["lap_time"] = self.laps.lap_times[-1]
+
+    def update_motor(self):
+        # merge the newest frame of every motor message; each message has its own age
+        now = time.monotonic()
+        motor = {}
+        newest = None
+        for rx_time, _, name, values in self.motor_frames.read():
+            if now - rx_time < MOTOR_STALE:
+                motor.update(values)
+                self.field_times['motor.' + name] = rx_time
+                newest = rx_time if newest is None else max(newest, rx_time)
+        self.data['motor'] = motor  # a new dict every tick, the snapshot keeps the old one
+        if newest is not None:
+            self.field_times['motor'] = newest
+        if self.motor_notifier is not None:
+            if motor:
+                self.connection_status['motor'].update(ok=True, err=None)
+            else:
+                self.connection_status['motor'].update(ok=False, err=self.motor_frames.error or "No motor frames.")
+
     def update_battery(self):
-        data = self.read_serial_data(self.battery_serial, 'battery')
+        latest = self.latest('battery')
+        if latest is None:
+            return
+        t, data = latest
 
-        print("Battery: ")
-        print(data)
         # Combine the data
         try:
             if "V" in data:
-                self.data['battery'] = float(data['V'])
+                self.set_field('battery', float(data['V']), t)
             if "I" in data:
-                self.data['battery_I'] = float(data['I'])
+                self.set_field('battery_I', float(data['I']), t)
 
         except Exception as e:
             print(f"Failed to update battery data: {e}")
@@ -0,0 +1,87 @@
+# data_worker.py
+# Runs DataCapture.get_data() on its own QThread so a slow tick never blocks the
+# Qt event loop (and with it the camera and the labels).
+import time
+
+from PyQt5.QtCore import QMetaObject, QObject, QThread, QTimer, Qt, pyqtSignal, pyqtSlot
+
+
+class TickStats:
+    """How the acquisition ticks are keeping up."""
+
+    __slots__ = ('ticks', 'overruns', 'last_ms', 'max_ms', 'late_ms')
+
+    def __init__(self, ticks=0, overruns=0, last_ms=0.0, max_ms=0.0, late_ms=0.0):
+        self.ticks = ticks        # ticks so far
+        self.overruns = overruns  # ticks that took longer than the period or started a period late
+        self.last_ms = last_ms    # duration of the latest tick
+        self.max_ms = max_ms      # longest tick so far
+        self.late_ms = late_ms    # how late the latest tick started
+
+
+class DataWorker(QObject):
+    # snapshot, copy of connection_status, TickStats
+    snapshot_ready = pyqtSignal(object, object, object)
+
+    def __init__(self, data_capture, rate):
+        super().__init__()
+        self.data_capture = data_capture
+        self.period = 1.0 / rate
+        self.timer = None
+        self.ticks = 0
+        self.overruns = 0
+        self.max_ms = 0.0
+        self.next_due = None
+        self.overran = False
+
+    @pyqtSlot()
+    def start(self):
+        # created here so the timer lives on (and fires in) the worker thread
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(int(self.period * 1000))
+        self.next_due = time.perf_counter() + self.period
+
+    @pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None  # dropped here so Qt deletes it on the thread that owns it
+
+    @pyqtSlot()
+    def tick(self):
+        start = time.perf_counter()
+        late = max(0.0, start - self.next_due)
+        self.next_due = max(self.next_due + self.period, start)
+
+        snapshot = self.data_capture.get_data()
+        status = {key: dict(value) for key, value in self.data_capture.connection_status.items()}
+
+        duration = time.perf_counter() - start
+        self.ticks += 1
+        # a late start right after an overrun is the same stall, don't count it twice
+        overran = duration > self.period or (late > self.period / 2 and not self.overran)
+        if overran:
+            self.overruns += 1
+        self.overran = overran
+        self.max_ms = max(self.max_ms, duration * 1000)
+        stats = TickStats(self.ticks, self.overruns, duration * 1000, self.max_ms, late * 1000)
+        self.snapshot_ready.emit(snapshot, status, stats)
+
+
+def start_worker(data_capture, rate, on_snapshot):
+    """Start a DataWorker on a new QThread; returns (thread, worker)."""
+    thread = QThread()
+    worker = DataWorker(data_capture, rate)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.start)
+    worker.snapshot_ready.connect(on_snapshot)  # queued: the slot runs on the GUI thread
+    thread.start()
+    return thread, worker
+
+
+def stop_worker(thread, worker):
+    QMetaObject.invokeMethod(worker, 'stop', Qt.BlockingQueuedConnection)
+    thread.quit()
+    thread.wait()
@@ -0,0 +1,136 @@
+# gps_config.py
+# Startup configuration for the GPS receiver: raise the fix rate and turn off the
+# sentences we never use (GSV, GSA, GLL, VTG), keeping RMC for position/speed and
+# GGA for HDOP. MediaTek (PMTK) and u-blox (UBX) receivers are supported; each
+# command is only trusted once the receiver ACKs it, otherwise the receiver is
+# left on its defaults and the NMEA reader copes with whatever it sends.
+import re
+import struct
+import time
+
+from nmea_fast import xor_checksum
+
+ACK_TIMEOUT = 1.0 # seconds per command
+RATES = (10, 5)   # Hz, tried in order
+
+MTK_ACK = re.compile(rb'\$PMTK001,(\d+),(\d)\*')
+MTK_OK = b'3'
+# PMTK314 field order: GLL, RMC, VTG, GGA, GSA, GSV, then 13 reserved/vendor fields
+MTK_OUTPUT_RMC_GGA = 'PMTK314,0,1,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0'
+
+UBX_SYNC = b'\xb5\x62'
+UBX_CFG = 0x06
+UBX_CFG_MSG = 0x01
+UBX_CFG_RATE = 0x08
+UBX_NMEA_CLASS = 0xF0
+UBX_NMEA_OFF = {'GLL': 0x01, 'GSA': 0x02, 'GSV': 0x03, 'VTG': 0x05}
+
+
+def nmea_command(body):
+    return b'$%s*%02X\r\n' % (body.encode(), xor_checksum(body.encode()))
+
+
+def ubx_frame(cls, msg_id, payload):
+    frame = struct.pack('<BBH', cls, msg_id, len(payload)) + payload
+    a = b = 0
+    for byte in frame:
+        a = (a + byte) & 0xFF
+        b = (b + a) & 0xFF
+    return UBX_SYNC + frame + bytes((a, b))
+
+
+def ubx_ack(cls, msg_id, ack):
+    return ubx_frame(0x05, 0x01 if ack else 0x00, bytes((cls, msg_id)))
+
+
+def wait_for(ser, match, timeout=ACK_TIMEOUT):
+    """Read from a non-blocking port until match(buffer) returns something or timeout."""
+    buf = bytearray()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        n = ser.in_waiting
+        if n:
+            buf += ser.read(n)
+            result = match(buf)
+            if result is not None:
+                return result
+        else:
+            time.sleep(0.01)
+    return None
+
+
+def mtk_send(ser, body):
+    """Send a PMTK command. True if ACKed ok, False if refused, None if no answer."""
+    cmd = body.split(',')[0][4:].encode()
+
+    def match(buf):
+        for m in MTK_ACK.finditer(buf):
+            if m.group(1) == cmd:
+                return m.group(2) == MTK_OK
+        return None
+
+    ser.write(nmea_command(body))
+    return wait_for(ser, match)
+
+
+def ubx_send(ser, msg_id, payload):
+    """Send a UBX-CFG message. True on ACK-ACK, False on ACK-NAK, None if no answer."""
+    ack = ubx_ack(UBX_CFG, msg_id, True)
+    nak = ubx_ack(UBX_CFG, msg_id, False)
+
+    def match(buf):
+        if ack in buf:
+            return True
+        if nak in buf:
+            return False
+        return None
+
+    ser.write(ubx_frame(UBX_CFG, msg_id, payload))
+    return wait_for(ser, match)
+
+
+def configure_mtk(ser):
+    for rate in RATES:
+        ok = mtk_send(ser, f'PMTK220,{1000 // rate}')
+        if ok is None:
+            return None  # not a MediaTek receiver
+        if ok:
+            break
+    else:
+        rate = None
+    outputs = mtk_send(ser, MTK_OUTPUT_RMC_GGA)
+    return rate, bool(outputs)
+
+
+def configure_ubx(ser):
+    for rate in RATES:
+        # measRate (ms), navRate (cycles), timeRef (1 = GPS time)
+        ok = ubx_send(ser, UBX_CFG_RATE, struct.pack('<HHH', 1000 // rate, 1, 1))
+        if ok is None:
+            return None  # not a u-blox receiver
+        if ok:
+            break
+    else:
+        rate = None
+    outputs = True
+    for msg_id in UBX_NMEA_OFF.values():
+        # rate 0 on the current port turns the sentence off
+        outputs &= bool(ubx_send(ser, UBX_CFG_MSG, bytes((UBX_NMEA_CLASS, msg_id, 0))))
+    return rate, outputs
+
+
+def configure_receiver(ser):
+    """Try to set up the receiver on an open, non-blocking port.
+
+    Returns a short description for the status line, e.g. 'MTK 10 Hz RMC+GGA' or
+    'defaults (no ACK)'. Never raises for a receiver that refuses or stays quiet.
+    """
+    for name, configure in (('MTK', configure_mtk), ('UBX', configure_ubx)):
+        result = configure(ser)
+        if result is None:
+            continue
+        rate, outputs = result
+        rate_text = f'{rate} Hz' if rate else 'default rate'
+        output_text = 'RMC+GGA' if outputs else 'default sentences'
+        return f'{name} {rate_text} {output_text}'
+    return 'defaults (no ACK)'
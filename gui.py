@@ -1,34 +1,52 @@
+import startup # first, so the startup clock starts at launch
+import os
 import sys
 import datetime
+import time
 import atexit
 
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QGridLayout, QHBoxLayout, QVBoxLayout 
-from PyQt5.QtCore import QTimer, QDateTime
+from PyQt5.QtCore import QTimer, QDateTime, Qt
 from PyQt5.QtGui import QFont
-from PyQt5 import QtWebEngineWidgets
-import folium
-import cv2
 
 import data_capture
+from data_worker import start_worker, stop_worker
+from bindings import Bindings
+from charts import StripChart
+
+# map_view (QtWebEngine + folium), camera and stream (cv2) are slow to import and are
+# only imported once the window is up; see Dashboard.finish_startup
 
 
 DISABLE_DATA_CAPTURE = False
 DISABLE_CAMERA = False
+CAPTURE_DIR = None # set to a folder to record the raw serial bytes for serial_replay
+DATA_RATE = 1.0 # Hz, how often the acquisition worker publishes a snapshot
+REFRESH_RATE = 4.0 # Hz, how often the labels are redrawn from the newest snapshot
+STREAM_OUTPUTS = [] # e.g. ['logs/vod.mkv', 'rtmp://live.example/app/key'] to broadcast and record
+STARTUP_REPORT_TIMEOUT = 15.0 # seconds; print the startup timing by then even if a port never opens
 
 class Dashboard(QWidget):
     def __init__(self):
         super().__init__()
         if not DISABLE_DATA_CAPTURE:
-            self.data_capture = data_capture.DataCapture()
+            # returns straight away, the ports open in the background
+            self.data_capture = data_capture.DataCapture(capture_dir=CAPTURE_DIR)
+            startup.mark("data capture started")
         atexit.register(self.exit_handler)
         self.initUI()
+        startup.mark("window built")
 
     def exit_handler(self):
-        # self.front_video.release()
-        self.back_video.release()
-        cv2.destroyAllWindows()
-        
+        if self.stream is not None:
+            self.stream.stop()
+        if self.cameras is not None:
+            self.cameras.stop()
+
         # self.data_capture.board.shutdown()
+        if not DISABLE_DATA_CAPTURE:
+            stop_worker(self.data_thread, self.data_worker)
+            self.data_capture.stop()
         print ('Exit sucessful')
 
     def initUI(self):
@@ -42,11 +60,14 @@ class Dashboard(QWidget):
         data_table_layout = QGridLayout()
         canvas.addLayout(left)
         self.setLayout(canvas)
+        self.canvas = canvas
 
-        self.map = folium.Map(location=[45.5236, -122.6750], zoom_start=15)
-        self.map_widget = QtWebEngineWidgets.QWebEngineView()
-        self.map_widget.setHtml(self.map.get_root().render())
-        canvas.addWidget(self.map_widget)
+        # the map is swapped in for this by map_setup()
+        self.tile_server = None
+        self.map_widget = None
+        self.map_placeholder = QLabel('Loading map...')
+        self.map_placeholder.setAlignment(Qt.AlignCenter)
+        canvas.addWidget(self.map_placeholder)
 
         # Define labels
         self.speed_label = QLabel('Speed: 0 km/h | 0 mph')
@@ -84,6 +105,18 @@ class Dashboard(QWidget):
         left.addWidget(self.speed_label)
         left.addLayout(data_table_layout)
 
+        # trends over the last few minutes, straight from the history store
+        self.charts = []
+        if not DISABLE_DATA_CAPTURE:
+            history = self.data_capture.history
+            self.charts = [
+                StripChart(history, 'speed', 'Speed', 'mph', scale=0.621371),
+                StripChart(history, 'battery_I', 'Pack current', 'A', scale=0.001, color='deepskyblue'),  # mA
+                StripChart(history, 'PPV', 'Solar power', 'W', color='gold'),
+            ]
+            for chart in self.charts:
+                left.addWidget(chart)
+
         data_table_layout.addWidget(self.distance_label, 1, 0)
         data_table_layout.addWidget(self.time_label, 2, 0)
         data_table_layout.addWidget(self.lap_count_label, 3, 0)
@@ -98,19 +131,23 @@ class Dashboard(QWidget):
 
         print("GUI setup good.")
 
-        # Update time every second
-        self.data_timer = QTimer(self)
-        self.data_timer.timeout.connect(self.update_data)
-        self.data_timer.start(1000)  # Update every 100 milliseconds
+        # Cameras capture on their own threads; the timer only paints the newest frame.
+        # The views are added by camera_setup()
+        self.cameras = None
+        self.camera_views = {}
+        self.cameras_layout = QVBoxLayout()
+        canvas.addLayout(self.cameras_layout)
+        self.camera_label = QLabel('Camera: -')
 
         self.camera_timer = QTimer(self)
         self.camera_timer.timeout.connect(self.display_camera_streams)
         self.camera_timer.start(30) # about 30 fps
 
-        # self.front_video = None
-        self.back_video = None
-
-        if not DISABLE_CAMERA : self.camera_setup()
+        # cameras + telemetry composed and encoded by ffmpeg (see stream.py)
+        self.snapshot = None
+        self.stream = None
+        self.started = False   # finish_startup() done
+        self.reported = False  # startup timing printed
         # Right under the other data, insert connection status labels:
         self.solar1_status_label  = QLabel()
         self.solar2_status_label  = QLabel()
@@ -131,107 +168,183 @@ class Dashboard(QWidget):
         data_table_layout.addWidget(self.gps_status_label,    4, 2)
         data_table_layout.addWidget(self.battery_status_label,4, 3)
 
+        # how the acquisition worker keeps up (tick time, overruns)
+        self.tick_label = QLabel('Tick: -')
+        self.tick_label.setFont(status_font)
+        data_table_layout.addWidget(self.tick_label, 5, 0, 1, 4)
+        self.camera_label.setFont(status_font)
+        data_table_layout.addWidget(self.camera_label, 6, 0, 1, 4)
+
+        # Labels are redrawn on their own timer, only where something changed
+        self.bindings = Bindings()
+        self.bind_labels()
+        self.render_timer = QTimer(self)
+        self.render_timer.timeout.connect(self.render)
+        self.render_timer.start(int(1000 / REFRESH_RATE))
+
+        # Acquisition runs on its own thread and sends a snapshot every tick
+        if not DISABLE_DATA_CAPTURE:
+            self.data_thread, self.data_worker = start_worker(self.data_capture, DATA_RATE, self.update_data)
+
+    def finish_startup(self):
+        # the slow parts, one per event loop turn so the window keeps painting in between
+        steps = [self.map_setup]
+        if not DISABLE_CAMERA:
+            steps.append(self.camera_setup)
+        if STREAM_OUTPUTS:
+            steps.append(self.stream_setup)
+
+        def run_next():
+            if not steps:
+                self.started = True
+                return
+            step = steps.pop(0)
+            try:
+                step()
+                startup.mark(step.__name__)
+            except Exception as e:
+                print(f"{step.__name__} failed: {e}")
+            QTimer.singleShot(0, run_next)
+        QTimer.singleShot(0, run_next)
+
+    def map_setup(self):
+        # loaded once, then only the marker moves (see map_view.py)
+        from map_view import MapView
+        import tile_cache
+
+        bounds = data_capture.GPS_BOUNDS
+        center = [(bounds[0][0] + bounds[1][0]) / 2, (bounds[0][1] + bounds[1][1]) / 2]
+        finish_line = data_capture.FINISH_LINE  # the line the lap counter uses
+        # tiles and the page's JS/CSS come from the local cache when there is one
+        # (python tile_cache.py fills it)
+        if os.path.exists(tile_cache.CACHE_PATH):
+            self.tile_server = tile_cache.TileServer(tile_cache.TileCache()).start()
+            self.map_widget = MapView(center, finish_line, tiles=self.tile_server.url_template,
+                                      attr=tile_cache.ATTRIBUTION, asset_url=self.tile_server.asset_url)
+        else:
+            self.map_widget = MapView(center, finish_line)
+        self.map_widget.loadFinished.connect(lambda ok: startup.mark("map loaded"))
+        self.canvas.replaceWidget(self.map_placeholder, self.map_widget)
+        self.map_placeholder.deleteLater()
+        if self.snapshot is not None and 'gps' in self.snapshot['age']:
+            self.map_widget.update_position(self.snapshot['gps'])
+
     def camera_setup(self):
-        # self.front_video = cv2.VideoCapture(1, cv2.CAP_DSHOW)
-        self.back_video = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        self.back_video.set(cv2.CAP_PROP_FRAME_WIDTH, 1024)
-        self.back_video.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        from camera import CAMERAS, CameraManager, CameraView
+
+        for name in CAMERAS:
+            self.camera_views[name] = CameraView()
+            self.camera_views[name].setMinimumSize(320, 240)
+            self.cameras_layout.addWidget(self.camera_views[name])
+        self.cameras = CameraManager(CAMERAS).start()
+
+    def stream_setup(self):
+        from camera import CAMERAS
+        from stream import StreamEncoder
+
+        self.stream = StreamEncoder(STREAM_OUTPUTS, CAMERAS, self.stream_frames, self.stream_snapshot).start()
 
     def display_camera_streams(self):
 
-        if DISABLE_CAMERA: return
-
-        # ret1, frame1 = self.front_video.read()
-        ret2, frame2 = self.back_video.read()
-
-        # if not ret1 or not ret2:
-        #     print("Failed to capture video frames")
-        #     return
-
-        # cv2.imshow("Front Camera", frame1)
-        cv2.imshow("Back Camera", frame2)
-
-        if cv2.waitKey(1) == ord('q'):
-            # self.front_video.release()
-            self.back_video.release()
-            cv2.destroyAllWindows()
-
-    def update_data(self):
-        if DISABLE_DATA_CAPTURE: return
-        data = self.data_capture.get_data()
-        print(data)
-        # print(str(datetime.timedelta(seconds=data['time']))[:7])
-        self.speed_label.setText('Speed: ' + str(round(data['speed'] * 0.621371,3)) + "mph")
-        self.distance_label.setText('Distance: ' + str(round(data['distance'],3)) + ' km')
-        self.temperature_label.setText('Temperature: ' + str(round(data['temperature'],3)) + '°C')
-        self.time_label.setText('Time: ' + str(datetime.timedelta(seconds=data['time']))[:7])
-
-        self.battery_voltage_label.setText('Battery V: ' + str(round(data['battery'],3)) + 'V')
-        self.battery_current_label.setText('Battery I: ' + str(round(data['battery_I'],3)) + 'A')
-
-        self.lap_count_label.setText('Lap Count: ' + str(round(data['lap'],3)))
-        self.panel_current_label.setText('Panel I: ' + str(round(data['I'],3)) + 'mA')
-        self.panel_ppv_label.setText('Panel PPV: ' + str(round(data['PPV'],3)) + 'W')
-        self.panel_voltage_label.setText('Panel V: ' + str(round(data['V'],3)) + 'mV')
-        if data['gps'] != ['','']:
-            self.map = folium.Map(location=data["gps"], zoom_start=15)
-            folium.Marker(location=data["gps"], popup="Kent Solar Car").add_to(self.map)
-            folium.Rectangle(
-                bounds=data["gps_bounds"],
-                line_join="bevel",
-                dash_array="15, 10, 5, 10, 15",
-                color="blue",
-                line_cap= "round",
-                fill= True,
-                fill_color="red",
-                weight=5,
-                popup="Finish Line",
-                tooltip= "<strong>Finish Line</strong>",
-            ).add_to(self.map)
-
-        self.map_widget.setHtml(self.map.get_root().render())
-        cs = self.data_capture.connection_status
-
-        # set tooltips for each connection-status label
-        for key, label in [
-            ('solar1',  self.solar1_status_label),
-            ('solar2',  self.solar2_status_label),
-            ('gps',     self.gps_status_label),
-            ('battery', self.battery_status_label),
-        ]:
-            status = cs[key]
-            if status['ok']:
-                label.setToolTip("Connected successfully")
+        if self.cameras is None: return
+
+        # never blocks; only cameras with a new, fresh frame are in here
+        for name, frame in self.cameras.take().items():
+            self.camera_views[name].set_frame(frame)
+
+        parts = []
+        for name, stats in self.cameras.status().items():
+            if stats.ok:
+                parts.append(f"{name}: {stats.fps:.0f} fps {stats.latency_ms:.0f} ms, dropped {stats.dropped}")
             else:
-                label.setToolTip(status['err'] or "Unknown error")
+                parts.append(f"{name}: FAIL ({stats.err})")
+        text = "Cameras: " + " | ".join(parts)
+        if text != self.camera_label.text():
+            self.camera_label.setText(text)
+
+    def bind_labels(self):
+        # every label and how to format it from a snapshot; see bindings.py
+        def status(name, key):
+            def format(data, cs, stats):
+                ok = cs[key]['ok']
+                return (f"{name}: {'OK' if ok else 'FAIL'}", style(ok),
+                        "Connected successfully" if ok else (cs[key]['err'] or "Unknown error"))
+            return format
 
         def style(ok):
             return "color: green;" if ok else "color: red;"
 
-        self.solar1_status_label.setText(
-            f"Solar 1: {'OK' if cs['solar1']['ok'] else 'FAIL'}"
-        )
-        self.solar1_status_label.setStyleSheet(style(cs['solar1']['ok']))
-
-        self.solar2_status_label.setText(
-            f"Solar 2: {'OK' if cs['solar2']['ok'] else 'FAIL'}"
-        )
-        self.solar2_status_label.setStyleSheet(style(cs['solar2']['ok']))
-
-        self.gps_status_label.setText(
-            f"GPS: {'OK' if cs['gps']['ok'] else 'FAIL'}"
-        )
-        self.gps_status_label.setStyleSheet(style(cs['gps']['ok']))
-
-        self.battery_status_label.setText(
-            f"Battery: {'OK' if cs['battery']['ok'] else 'FAIL'}"
-        )
-        self.battery_status_label.setStyleSheet(style(cs['battery']['ok']))
+        bind = self.bindings.bind
+        bind(self.speed_label, lambda data, cs, stats: 'Speed: ' + str(round(data['speed'] * 0.621371,3)) + "mph")
+        bind(self.distance_label, lambda data, cs, stats: 'Distance: ' + str(round(data['distance'],3)) + ' km')
+        bind(self.temperature_label, lambda data, cs, stats: 'Temperature: ' + str(round(data['temperature'],3)) + '°C')
+        bind(self.time_label, lambda data, cs, stats: 'Time: ' + str(datetime.timedelta(seconds=data['time']))[:7])
+
+        bind(self.battery_voltage_label, lambda data, cs, stats: 'Battery V: ' + str(round(data['battery'],3)) + 'V')
+        bind(self.battery_current_label, lambda data, cs, stats: 'Battery I: ' + str(round(data['battery_I'],3)) + 'A')
+
+        bind(self.lap_count_label, lambda data, cs, stats: 'Lap Count: ' + str(round(data['lap'],3)))
+        bind(self.panel_current_label, lambda data, cs, stats: 'Panel I: ' + str(round(data['I'],3)) + 'mA')
+        bind(self.panel_ppv_label, lambda data, cs, stats: 'Panel PPV: ' + str(round(data['PPV'],3)) + 'W')
+        bind(self.panel_voltage_label, lambda data, cs, stats: 'Panel V: ' + str(round(data['V'],3)) + 'mV')
+
+        bind(self.solar1_status_label, status('Solar 1', 'solar1'))
+        bind(self.solar2_status_label, status('Solar 2', 'solar2'))
+        bind(self.gps_status_label, status('GPS', 'gps'))
+        bind(self.battery_status_label, status('Battery', 'battery'))
+
+        bind(self.tick_label, lambda data, cs, stats: (
+            f"Tick: {stats.last_ms:.1f} ms (max {stats.max_ms:.1f}) | overruns: {stats.overruns}/{stats.ticks}",
+            style(stats.last_ms < 1000 / DATA_RATE), None))
+
+    def update_data(self, data, cs, stats):
+        # runs on the GUI thread for every snapshot from the DataWorker; it is only
+        # drawn on the next render tick
+        if self.snapshot is None:
+            startup.mark("first snapshot")
+        self.snapshot = data
+        self.bindings.push(data, cs, stats)
+
+    def stream_frames(self):
+        return {} if self.cameras is None else self.cameras.latest()
+
+    def stream_snapshot(self):
+        # called from the encoder thread; snapshots are immutable, so handing one over is safe
+        return self.snapshot
+
+    def render(self):
+        if not self.reported and self.startup_settled():
+            self.reported = True
+            startup.report()
+        rendered = self.bindings.render()
+        if rendered is None:
+            return  # nothing new since the last render
+        data = rendered[0]
+        for chart in self.charts:
+            chart.update()
+        if self.map_widget is not None and 'gps' in data['age']:  # only once there has been a real fix
+            self.map_widget.update_position(data['gps'])
+
+    def startup_settled(self):
+        # everything is up: deferred setup done, every port opened or failed, data flowing
+        if time.perf_counter() - startup.T0 > STARTUP_REPORT_TIMEOUT:
+            return True
+        if not self.started:
+            return False
+        if DISABLE_DATA_CAPTURE:
+            return True
+        return self.snapshot is not None and all(f.done() for f in self.data_capture.opening.values())
 
 if __name__ == '__main__':
     import sys
+    # lets QtWebEngine be imported after the QApplication exists (map_view is imported lazily)
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    # warm up the slow imports on another thread while the window comes up
+    startup.preload('cv2', 'folium')
     app = QApplication(sys.argv)
     dashboard = Dashboard()
     dashboard.show()
+    startup.mark("window shown")
+    dashboard.finish_startup()
 
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
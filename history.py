@@ -0,0 +1,112 @@
+# history.py
+# Columnar telemetry history: one preallocated NumPy column per channel plus a
+# shared timestamp column, in a fixed-size ring.
+#
+# Every sample is written twice, at i and i + capacity, so the last n samples are
+# always one contiguous slice. That keeps append O(1) and lets window() hand out
+# plain views (no copies, no wrap-around handling) to whoever is reading.
+#
+# append() and the readers take a lock, so another thread (the GUI reading what
+# the data worker appends) never sees a half-written sample. Views are only
+# valid until the next append; a reader on another thread asks for copy=True.
+import threading
+
+import numpy as np
+
+# 10 hours of 1 Hz ticks, ~0.58 MB per channel with the mirror (2 x 36000 float64)
+DEFAULT_CAPACITY = 10 * 60 * 60
+
+# np.trapz was renamed in NumPy 2.0
+trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+class HistoryStore:
+    def __init__(self, channels, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.channels = tuple(channels)
+        self.t = np.zeros(2 * capacity, dtype=np.float64)
+        self.columns = {name: np.full(2 * capacity, np.nan, dtype=np.float64) for name in self.channels}
+        self.head = 0  # next write position, 0 <= head < capacity
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def append(self, t, values):
+        """Add one sample. Channels missing from `values` (or None) are stored as NaN."""
+        with self.lock:
+            i = self.head
+            j = i + self.capacity
+            self.t[i] = self.t[j] = t
+            for name, column in self.columns.items():
+                value = values.get(name)
+                column[i] = column[j] = np.nan if value is None else value
+            self.head = (i + 1) % self.capacity
+            if self.size < self.capacity:
+                self.size += 1
+
+    def _span(self, n):
+        # slice covering the newest n samples in the mirrored buffer
+        end = self.head + self.capacity
+        return slice(end - n, end)
+
+    def last(self, n=None):
+        """Slice for the newest n samples (all of them if n is None)."""
+        n = self.size if n is None else min(n, self.size)
+        return self._span(n)
+
+    def since(self, seconds):
+        """Slice for the samples no older than `seconds` before the newest one."""
+        span = self.last()
+        t = self.t[span]
+        if not len(t):
+            return span
+        start = np.searchsorted(t, t[-1] - seconds, side='left')
+        return slice(span.start + start, span.stop)
+
+    def _window(self, name, seconds=None, n=None):
+        # caller holds the lock
+        span = self.since(seconds) if seconds is not None else self.last(n)
+        return self.t[span], self.columns[name][span]
+
+    def window(self, name, seconds=None, n=None, copy=False):
+        """(t, values) for one channel.
+
+        Views unless copy is set; don't keep views across appends, and use copy
+        from any thread other than the one appending.
+        """
+        with self.lock:
+            t, v = self._window(name, seconds, n)
+            return (t.copy(), v.copy()) if copy else (t, v)
+
+    def mean(self, name, seconds=None, n=None):
+        with self.lock:
+            return float(np.nanmean(self._window(name, seconds, n)[1])) if self.size else np.nan
+
+    def min(self, name, seconds=None, n=None):
+        with self.lock:
+            return float(np.nanmin(self._window(name, seconds, n)[1])) if self.size else np.nan
+
+    def max(self, name, seconds=None, n=None):
+        with self.lock:
+            return float(np.nanmax(self._window(name, seconds, n)[1])) if self.size else np.nan
+
+    def integral(self, name, seconds=None, n=None):
+        """Trapezoid integral of a channel over time (value x seconds), NaNs skipped."""
+        t, v = self.window(name, seconds, n, copy=True)
+        ok = ~np.isnan(v)
+        if ok.sum() < 2:
+            return 0.0
+        return float(trapezoid(v[ok], t[ok]))
+
+    def rolling_mean(self, name, width, seconds=None, n=None):
+        """Mean over a sliding window of `width` samples, one value per full window.
+
+        Windows that contain a NaN come out as NaN.
+        """
+        v = self.window(name, seconds, n, copy=True)[1]
+        if len(v) < width:
+            return np.empty(0)
+        c = np.cumsum(np.insert(v, 0, 0.0))
+        return (c[width:] - c[:-width]) / width
@@ -0,0 +1,95 @@
+# map_view.py
+# The dashboard map. The folium/Leaflet page is rendered and loaded once; after
+# that the car marker is moved with small runJavaScript calls instead of
+# rebuilding the whole page, which reloaded Leaflet and every tile each tick.
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+from PyQt5 import QtWebEngineWidgets
+
+# Longest breadcrumb trail kept on the map (points)
+TRAIL_LENGTH = 3000
+
+# Keep the car inside the middle of the view; pan once it leaves this margin
+PAN_MARGIN = 0.25 # fraction of the view on each side
+
+
+class CarTracker(MacroElement):
+    """Car marker, breadcrumb trail and the updateCar(lat, lon) JS function."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var car = L.marker({{ this.location }}).bindPopup("Kent Solar Car").addTo({{ this._parent.get_name() }});
+        var trail = L.polyline([], {color: "orange", weight: 3}).addTo({{ this._parent.get_name() }});
+        function updateCar(lat, lon) {
+            var map = {{ this._parent.get_name() }};
+            var pos = L.latLng(lat, lon);
+            car.setLatLng(pos);
+            var points = trail.getLatLngs();
+            points.push(pos);
+            if (points.length > {{ this.trail_length }}) {
+                points.splice(0, points.length - {{ this.trail_length }});
+            }
+            trail.setLatLngs(points);
+            if (!map.getBounds().pad(-{{ this.margin }}).contains(pos)) {
+                map.panTo(pos);
+            }
+        }
+        {% endmacro %}
+    """)
+
+    def __init__(self, location, trail_length=TRAIL_LENGTH, margin=PAN_MARGIN):
+        super().__init__()
+        self._name = 'CarTracker'
+        self.location = [float(location[0]), float(location[1])]
+        self.trail_length = trail_length
+        self.margin = margin
+
+
+def finish_line_polyline(line):
+    # the segment track.LapDetector counts crossings of
+    return folium.PolyLine(
+        locations=[list(point) for point in line],
+        line_join="bevel",
+        dash_array="15, 10, 5, 10, 15",
+        color="red",
+        line_cap="round",
+        weight=5,
+        popup="Finish Line",
+        tooltip="<strong>Finish Line</strong>",
+    )
+
+
+class MapView(QtWebEngineWidgets.QWebEngineView):
+    def __init__(self, location, finish_line, zoom_start=15, tiles='OpenStreetMap', attr=None, asset_url=None):
+        super().__init__()
+        self.loaded = False
+        self.pending = None  # newest position that arrived before the page finished loading
+        self.position = None
+
+        self.map = folium.Map(location=location, zoom_start=zoom_start, tiles=tiles, attr=attr)
+        if asset_url is not None:
+            # asset_url(cdn url) -> where to load it from instead, e.g. TileServer.asset_url
+            self.map.default_js = [(name, asset_url(url)) for name, url in self.map.default_js]
+            self.map.default_css = [(name, asset_url(url)) for name, url in self.map.default_css]
+        finish_line_polyline(finish_line).add_to(self.map)
+        CarTracker(location).add_to(self.map)
+
+        self.loadFinished.connect(self.on_load_finished)
+        self.setHtml(self.map.get_root().render())
+
+    def on_load_finished(self, ok):
+        self.loaded = ok
+        if ok and self.pending is not None:
+            self.update_position(self.pending)
+            self.pending = None
+
+    def update_position(self, position):
+        lat, lon = position
+        if (lat, lon) == self.position:
+            return  # parked, nothing to redraw
+        if not self.loaded:
+            self.pending = (lat, lon)
+            return
+        self.position = (lat, lon)
+        self.page().runJavaScript(f"updateCar({float(lat)}, {float(lon)});")
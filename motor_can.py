@@ -0,0 +1,57 @@
+# motor_can.py
+# Motor controller status frames on the CAN bus: where the bus is, and how to
+# decode each frame. Shared by DataCapture and read_motor_test.py.
+from can_decoder import Signal, compile_messages, load_dbc
+
+# ─── CONFIG ───────────────────────────────────────────────────────────────────
+BASE_ID = 0x64           # the controller's "CAN TX address"
+CAN_BUS = {              # keyword arguments for can.Bus
+    'interface': 'pcan',
+    'channel': 'PCAN_USBBUS1',
+    'bitrate': 125000,
+}
+
+# ─── MESSAGES ─────────────────────────────────────────────────────────────────
+# Each one is compiled into a single struct.Struct unpack (see can_decoder.py)
+
+def bits_set(u64):
+    # only loops over the bits that are set, usually none
+    bits = []
+    while u64:
+        low = u64 & -u64
+        bits.append(low.bit_length() - 1)
+        u64 ^= low
+    return bits
+
+MESSAGES = {
+    BASE_ID + 0: ('status_0', [
+        Signal('control_value',      0, 'h'),
+        Signal('control_mode',       2, 'B', bits=(1, 1)),
+        Signal('motor_mode',         2, 'B', bits=(3, 3)),
+        Signal('sw_enable',          2, 'B', bits=(6, 1), convert=bool),
+        Signal('motor_state',        2, 'B', bits=(7, 2)),
+        Signal('motor_torque',       3, 'h'),
+        Signal('motor_rpm',          5, 'h', scale=0.1),
+        Signal('motor_temp',         7, 'b'),
+    ]),
+    BASE_ID + 1: ('status_1', [
+        Signal('inv_peak_current_A', 0, 'h'),
+        Signal('motor_power_W',      2, 'h'),
+        Signal('abs_position_deg',   4, 'H', scale=0.1),
+    ]),
+    BASE_ID + 2: ('status_2', [
+        Signal('warning_bits_set',   0, 'Q', convert=bits_set),
+    ]),
+    BASE_ID + 3: ('status_3', [
+        Signal('error_bits_set',     0, 'Q', convert=bits_set),
+    ]),
+}
+
+# A DBC file for the controller, if there is one, replaces MESSAGES
+DBC_FILE = None
+
+# arbitration id -> MessageDecoder
+decoders = compile_messages(load_dbc(DBC_FILE) if DBC_FILE else MESSAGES)
+
+# arbitration id -> (parse(data) -> record, message name); the record is reused by the next frame
+parsers = {can_id: (decoder.decode, decoder.name) for can_id, decoder in decoders.items()}
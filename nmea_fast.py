@@ -0,0 +1,86 @@
+# nmea_fast.py
+# Minimal NMEA 0183 parser for the three sentences the car uses (RMC, GGA, VTG).
+# Works on raw bytes, checks the checksum and converts positions straight to
+# decimal degrees. Other sentence types should be skipped with sentence_type()
+# before calling parse(), so they cost nothing.
+from collections import namedtuple
+
+KNOTS_TO_KMH = 1.852
+
+# speed is km/h everywhere; utc is seconds since midnight UTC
+RMC = namedtuple('RMC', 'utc valid lat lon speed course')
+GGA = namedtuple('GGA', 'utc lat lon quality sats hdop alt')
+VTG = namedtuple('VTG', 'course speed')
+
+FIX_TYPES = (b'RMC', b'GGA', b'VTG')
+
+# fields parse() reads from each sentence (address field included); a sentence
+# cut short but with a valid checksum has fewer
+MIN_FIELDS = {b'RMC': 9, b'GGA': 10, b'VTG': 8}
+
+
+def sentence_type(line):
+    """b'RMC' for b'$GPRMC,...' / b'$GNRMC,...' etc. Talker id is ignored."""
+    return line[3:6]
+
+
+def xor_checksum(body):
+    # XOR of all bytes, folded as one big int instead of a Python loop per byte
+    n = len(body)
+    if not n:
+        return 0
+    x = int.from_bytes(body, 'little')
+    shift = 4 << (n - 1).bit_length()  # half of n rounded up to a power of two, in bits
+    while shift >= 8:
+        x = (x ^ (x >> shift)) & ((1 << shift) - 1)
+        shift >>= 1
+    return x
+
+
+def to_degree(field, hemisphere):
+    # ddmm.mmmm / dddmm.mmmm -> decimal degrees, negative for S and W
+    if not field:
+        return None
+    dot = field.find(b'.')
+    if dot < 0:
+        dot = len(field)
+    degrees = int(field[:dot - 2]) + float(field[dot - 2:]) / 60
+    return -degrees if hemisphere in (b'S', b'W') else degrees
+
+
+def to_utc(field):
+    if len(field) < 6:
+        return None
+    return int(field[0:2]) * 3600 + int(field[2:4]) * 60 + float(field[4:])
+
+
+def to_float(field):
+    return float(field) if field else None
+
+
+def to_int(field):
+    return int(field) if field else None
+
+
+def parse(line):
+    """Parse one sentence (with or without \\r\\n). Raises ValueError if garbled."""
+    line = line.rstrip(b'\r\n')
+    star = line.rfind(b'*')
+    if not line.startswith(b'$') or star < 0 or len(line) - star != 3:
+        raise ValueError(f"malformed sentence {line!r}")
+    if xor_checksum(line[1:star]) != int(line[star + 1:], 16):
+        raise ValueError(f"bad checksum {line!r}")
+    f = line[1:star].split(b',')
+    kind = f[0][2:]
+    if len(f) < MIN_FIELDS.get(kind, 0):
+        raise ValueError(f"truncated sentence {line!r}")
+    if kind == b'RMC':
+        speed = to_float(f[7])
+        return RMC(to_utc(f[1]), f[2] == b'A', to_degree(f[3], f[4]), to_degree(f[5], f[6]),
+                   None if speed is None else speed * KNOTS_TO_KMH, to_float(f[8]))
+    if kind == b'GGA':
+        return GGA(to_utc(f[1]), to_degree(f[2], f[3]), to_degree(f[4], f[5]),
+                   to_int(f[6]), to_int(f[7]), to_float(f[8]), to_float(f[9]))
+    if kind == b'VTG':
+        return VTG(to_float(f[1]), to_float(f[7]))
+    raise ValueError(f"unsupported sentence {kind!r}")
@@ -0,0 +1,95 @@
+# overlay.py
+# Telemetry text drawn over video frames without re-rasterizing it every frame.
+#
+# Each OverlayField formats its value from the snapshot; the text is only drawn
+# (cv2.putText) the first time that exact string is seen, into a small tile with
+# its own alpha mask. Every frame after that is just an integer alpha blend of
+# the cached tile into the frame with numpy slicing.
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Different strings kept per field; speed and friends cycle through few values
+TILE_CACHE_SIZE = 64
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+PADDING = 6       # pixels around the text inside its box
+BOX_ALPHA = 128   # 0-255 opacity of the dark box behind the text
+
+
+class Tile:
+    __slots__ = ('fg', 'inv', 'h', 'w')
+
+    def __init__(self, fg, inv):
+        self.fg = fg    # color * coverage (premultiplied, 0-65025), uint16
+        self.inv = inv  # 255 - alpha, uint16
+        self.h, self.w = inv.shape[:2]
+
+
+def render_tile(text, scale, color, thickness, box_alpha=BOX_ALPHA):
+    """Rasterize text once into a Tile: the text in color over a translucent dark box."""
+    (tw, th), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+    h, w = th + baseline + 2 * PADDING, tw + 2 * PADDING
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.putText(mask, text, (PADDING, PADDING + th), FONT, scale, 255, thickness, cv2.LINE_AA)
+    alpha = np.maximum(mask, box_alpha).astype(np.uint16)[:, :, None]
+    # premultiplied: the text's color times its coverage; the box itself is black
+    fg = mask.astype(np.uint16)[:, :, None] * np.array(color, dtype=np.uint16)
+    return Tile(fg, 255 - alpha)
+
+
+class OverlayField:
+    """One piece of text at a fixed spot; format(snapshot) -> str."""
+
+    def __init__(self, name, position, format, scale=0.9, color=(255, 255, 255), thickness=2):
+        self.name = name
+        self.position = position  # (x, y) of the tile's top-left corner
+        self.format = format
+        self.scale = scale
+        self.color = color
+        self.thickness = thickness
+        self.tiles = OrderedDict()  # text -> Tile, least recently used first
+        self.renders = 0
+
+    def tile(self, text):
+        tile = self.tiles.get(text)
+        if tile is not None:
+            self.tiles.move_to_end(text)
+            return tile
+        tile = render_tile(text, self.scale, self.color, self.thickness)
+        self.renders += 1
+        self.tiles[text] = tile
+        if len(self.tiles) > TILE_CACHE_SIZE:
+            self.tiles.popitem(last=False)
+        return tile
+
+
+def blend(frame, tile, x, y):
+    """Alpha blend tile into frame in place at (x, y), clipped to the frame."""
+    fh, fw = frame.shape[:2]
+    h, w = min(tile.h, fh - y), min(tile.w, fw - x)
+    if h <= 0 or w <= 0 or x < 0 or y < 0:
+        return
+    roi = frame[y:y + h, x:x + w]
+    roi[:] = (roi * tile.inv[:h, :w] + tile.fg[:h, :w] + 127) // 255
+
+
+class Overlay:
+    def __init__(self, fields):
+        self.fields = list(fields)
+
+    def draw(self, frame, snapshot):
+        """Draw every field onto frame (BGR, modified in place)."""
+        for field in self.fields:
+            try:
+                text = field.format(snapshot)
+            except (KeyError, TypeError, ValueError):
+                continue  # value not there yet
+            x, y = field.position
+            blend(frame, field.tile(text), x, y)
+        return frame
+
+    @property
+    def renders(self):
+        return sum(field.renders for field in self.fields)
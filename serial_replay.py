@@ -0,0 +1,175 @@
+# serial_replay.py
+# Record the raw bytes coming off each serial port during a drive, and play them
+# back later through DataCapture without any hardware attached.
+#
+# A capture is one file per port (<key>.cap) of records:
+#   float64 wall-clock time, uint32 length, <length> raw bytes
+import glob
+import os
+import struct
+import time
+
+from serial import SerialException
+
+CAPTURE_RECORD = struct.Struct('<dI')
+
+# Recorded bytes are flushed to disk at least this often
+CAPTURE_FLUSH = 1.0 # seconds
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        self.last_flush = time.monotonic()
+
+    def write(self, t, chunk):
+        self.file.write(CAPTURE_RECORD.pack(t, len(chunk)) + chunk)
+        if time.monotonic() - self.last_flush > CAPTURE_FLUSH:
+            self.file.flush()
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        self.file.close()
+
+
+def read_capture(path):
+    """[(t, bytes), ...] from a .cap file, ignoring a torn last record."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    chunks = []
+    pos = 0
+    while pos + CAPTURE_RECORD.size <= len(data):
+        t, n = CAPTURE_RECORD.unpack_from(data, pos)
+        pos += CAPTURE_RECORD.size
+        if pos + n > len(data):
+            break
+        chunks.append((t, data[pos:pos + n]))
+        pos += n
+    return chunks
+
+
+class RecordingSerial:
+    """Wraps an open port and copies everything read from it into a CaptureWriter."""
+
+    def __init__(self, ser, writer):
+        self.ser = ser
+        self.writer = writer
+
+    def read(self, size=1):
+        chunk = self.ser.read(size)
+        if chunk:
+            self.writer.write(time.time(), chunk)
+        return chunk
+
+    def close(self):
+        self.ser.close()
+        self.writer.close()
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+
+class ReplaySerial:
+    """Stand-in for serial.Serial that releases recorded bytes on the recorded schedule.
+
+    Only what DataCapture uses is implemented: in_waiting, read(), write(), close().
+    Writes are accepted and thrown away.
+    """
+
+    def __init__(self, chunks, clock):
+        self.chunks = chunks
+        self.clock = clock  # clock() -> capture time that has "happened" so far
+        self.next = 0       # first chunk not yet released
+        self.buf = bytearray()
+        self.is_open = True
+        self.bytes_read = 0
+
+    def _release(self):
+        now = self.clock()
+        chunks = self.chunks
+        while self.next < len(chunks) and chunks[self.next][0] <= now:
+            self.buf += chunks[self.next][1]
+            self.next += 1
+
+    @property
+    def in_waiting(self):
+        self._release()
+        return len(self.buf)
+
+    @property
+    def done(self):
+        return self.next >= len(self.chunks) and not self.buf
+
+    def read(self, size=1):
+        self._release()
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self):
+        self._release()
+        i = self.buf.find(b'\n')
+        return self.read(len(self.buf) if i < 0 else i + 1)
+
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        self.buf.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+class Replay:
+    """Plays back a capture directory. Pass replay.open_port to DataCapture.
+
+    speed is the playback rate (1.0 = real time, 10.0 = 10x); speed=None releases
+    everything at once, for raw ingestion throughput. With paused=True nothing is
+    released until rewind(), e.g. while DataCapture is still opening its ports.
+    """
+
+    def __init__(self, directory, speed=1.0, paused=False):
+        self.captures = {}
+        for path in glob.glob(os.path.join(directory, '*.cap')):
+            key = os.path.splitext(os.path.basename(path))[0]
+            self.captures[key] = read_capture(path)
+        starts = [chunks[0][0] for chunks in self.captures.values() if chunks]
+        self.t0 = min(starts) if starts else 0.0
+        self.duration = max((chunks[-1][0] - self.t0 for chunks in self.captures.values() if chunks), default=0.0)
+        self.speed = speed
+        self.paused = paused
+        self.start = time.monotonic()
+        self.ports = {}
+
+    def clock(self):
+        if self.paused:
+            return float('-inf')
+        if self.speed is None:
+            return float('inf')
+        return self.t0 + (time.monotonic() - self.start) * self.speed
+
+    def rewind(self):
+        """Start playback over from the beginning, e.g. once DataCapture is set up
+        (startup steps like the GPS configuration read from the ports too)."""
+        for ser in self.ports.values():
+            ser.next = 0
+            ser.buf.clear()
+            ser.bytes_read = 0
+        self.start = time.monotonic()
+        self.paused = False
+
+    def open_port(self, key, port, baudrate):
+        if key not in self.captures:
+            raise SerialException(f"no capture for {key} ({port})")
+        ser = ReplaySerial(self.captures[key], self.clock)
+        self.ports[key] = ser
+        return ser
+
+    @property
+    def done(self):
+        return all(ser.done for ser in self.ports.values())
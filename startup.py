@@ -0,0 +1,39 @@
+# startup.py
+# Timing of the dashboard start: how long after launch each piece came up.
+#
+# Anything can call mark('name') as it finishes; report() prints them in order.
+# Import this first (gui.py does) so the clock starts as close to launch as it can.
+import importlib
+import threading
+import time
+
+T0 = time.perf_counter()
+
+marks = []  # (seconds since T0, name, thread)
+lock = threading.Lock()
+
+
+def mark(name):
+    with lock:
+        marks.append((time.perf_counter() - T0, name, threading.current_thread().name))
+
+
+def report():
+    with lock:
+        lines = [f"  {t * 1000:8.1f} ms  {name}" + ("" if thread == 'MainThread' else f"  [{thread}]")
+                 for t, name, thread in sorted(marks)]
+    print("Startup timing:\n" + "\n".join(lines))
+
+
+def preload(*modules):
+    """Import modules on a background thread, so the later real import is instant."""
+    def run():
+        for module in modules:
+            try:
+                importlib.import_module(module)
+                mark(f"{module} preloaded")
+            except ImportError as e:
+                print(f"Failed to preload {module}: {e}")
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,218 @@
+# stream.py
+# Live broadcast / VOD of the cameras with the telemetry on top.
+#
+# A Compositor lays the newest camera frames side by side with the telemetry
+# drawn over them (overlay.py), and StreamEncoder pipes the composed frames as raw BGR into an ffmpeg process
+# at a fixed rate. ffmpeg encodes once and writes to every output (a local file
+# for the VOD, an rtmp:// / srt:// / udp:// URL for the live stream).
+#
+#   python stream.py out.mkv udp://127.0.0.1:5000    # test pattern, no cameras
+import os
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from overlay import Overlay, OverlayField
+
+STREAM = {
+    'width': 1280,
+    'height': 720,
+    'fps': 30,
+    'bitrate': 3000,           # kbit/s
+    'keyframe_interval': 2.0,  # seconds; most platforms want 2
+}
+
+FFMPEG = 'ffmpeg'
+
+# Telemetry drawn over the bottom-left of the stream
+STREAM_FIELDS = [
+    OverlayField('speed', (10, 590), lambda d: f"{d['speed'] * 0.621371:.1f} mph", scale=1.6, thickness=3),
+    OverlayField('distance', (10, 660), lambda d: f"{d['distance']:.2f} km"),
+    OverlayField('lap', (200, 660), lambda d: f"Lap {d['lap']}"),
+    # the shunt reports mV and mA
+    OverlayField('battery', (340, 660), lambda d: f"{d['battery'] / 1000:.1f} V {d['battery_I'] / 1000:.1f} A"),
+    OverlayField('panels', (600, 660), lambda d: f"Panels {d['PPV']:.0f} W"),
+]
+
+# ffmpeg muxer for each kind of output; files go by extension
+URL_FORMATS = {'rtmp': 'flv', 'rtmps': 'flv', 'srt': 'mpegts', 'udp': 'mpegts', 'tcp': 'mpegts'}
+FILE_FORMATS = {'.mkv': 'matroska', '.mp4': 'mp4', '.ts': 'mpegts', '.flv': 'flv'}
+
+# If ffmpeg exits, start it again after this long
+RESTART_DELAY = 2.0 # seconds
+
+
+def output_format(target):
+    if '://' in target:
+        return URL_FORMATS.get(target.split('://', 1)[0].lower())
+    return FILE_FORMATS.get(os.path.splitext(target)[1].lower())
+
+
+def ffmpeg_command(outputs, width, height, fps, bitrate, keyframe_interval):
+    """ffmpeg arguments that read raw bgr24 frames on stdin and encode to every output."""
+    gop = str(max(1, round(fps * keyframe_interval)))
+    cmd = [FFMPEG, '-hide_banner', '-loglevel', 'error',
+           '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+           '-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'zerolatency', '-pix_fmt', 'yuv420p',
+           '-b:v', f'{bitrate}k', '-maxrate', f'{bitrate}k', '-bufsize', f'{2 * bitrate}k',
+           '-g', gop, '-keyint_min', gop, '-sc_threshold', '0']
+    if len(outputs) == 1:
+        fmt = output_format(outputs[0])
+        return cmd + (['-f', fmt] if fmt else []) + [outputs[0]]
+    # one encode, many outputs; a dropped stream must not end the recording
+    slaves = []
+    for target in outputs:
+        fmt = output_format(target)
+        options = (f'f={fmt}:' if fmt else '') + 'onfail=ignore'
+        slaves.append(f'[{options}]{target}')
+    # mkv/mp4/flv need the stream headers up front when they sit behind tee
+    return cmd + ['-flags', '+global_header', '-map', '0:v', '-f', 'tee', '|'.join(slaves)]
+
+
+class Compositor:
+    """Cameras side by side with the telemetry on top, drawn into one reused frame."""
+
+    def __init__(self, names, width, height, fields=STREAM_FIELDS):
+        self.names = list(names)
+        self.canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        cell_width = width // max(1, len(self.names))
+        # the part of the canvas each camera is drawn into
+        self.cells = {name: self.canvas[:, i * cell_width:(i + 1) * cell_width]
+                      for i, name in enumerate(self.names)}
+        self.frames = {}  # newest frame drawn per camera
+        self.overlay = Overlay(fields)
+
+    def compose(self, frames, snapshot):
+        """frames: {name: BGR ndarray}; missing cameras keep their last image."""
+        for name, frame in frames.items():
+            if name in self.cells:
+                self.frames[name] = frame
+        # the overlay is blended into the canvas, so the video under it is redrawn every frame
+        for name, frame in self.frames.items():
+            self.fit(frame, self.cells[name])
+        if snapshot is not None:
+            self.overlay.draw(self.canvas, snapshot)
+        return self.canvas
+
+    @staticmethod
+    def fit(frame, cell):
+        # letterbox frame into cell, resizing straight into the canvas
+        ch, cw = cell.shape[:2]
+        fh, fw = frame.shape[:2]
+        scale = min(cw / fw, ch / fh)
+        w, h = max(1, int(fw * scale)), max(1, int(fh * scale))
+        x, y = (cw - w) // 2, (ch - h) // 2
+        cell[:] = 0
+        cv2.resize(frame, (w, h), dst=cell[y:y + h, x:x + w], interpolation=cv2.INTER_AREA)
+
+
+class StreamEncoder:
+    """Composes and encodes at a fixed frame rate on a background thread.
+
+    frames() -> {name: BGR ndarray} and snapshot() -> telemetry snapshot (or
+    None) are called once per frame from that thread. If ffmpeg can't keep up, frames are skipped rather
+    than queued, so the stream stays live.
+    """
+
+    def __init__(self, outputs, names, frames, snapshot, config=STREAM):
+        self.outputs = list(outputs)
+        self.frames = frames
+        self.snapshot = snapshot
+        self.config = dict(config)
+        self.compositor = Compositor(names, self.config['width'], self.config['height'])
+        self.proc = None
+        self.thread = None
+        self.running = False
+        self.ok = False
+        self.err = None
+        self.written = 0
+        self.skipped = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="stream-encoder", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        self.close_ffmpeg()
+
+    def open_ffmpeg(self):
+        cmd = ffmpeg_command(self.outputs, **self.config)
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def close_ffmpeg(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()  # end of input: ffmpeg finishes the files
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+    def run(self):
+        period = 1.0 / self.config['fps']
+        next_frame = time.perf_counter()
+        while self.running:
+            if self.proc is None:
+                try:
+                    self.open_ffmpeg()
+                    self.ok, self.err = True, None
+                except Exception as e:
+                    self.ok, self.err = False, str(e)
+                    time.sleep(RESTART_DELAY)
+                    continue
+                next_frame = time.perf_counter()
+
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                # behind by whole frames: skip them instead of bursting to catch up
+                missed = int(-delay // period)
+                self.skipped += missed
+                next_frame += missed * period
+            next_frame += period
+
+            canvas = self.compositor.compose(self.frames(), self.snapshot())
+            try:
+                self.proc.stdin.write(canvas.data)
+                self.written += 1
+            except (BrokenPipeError, OSError, ValueError) as e:
+                print(f"Stream encoder stopped: {e}")
+                self.ok, self.err = False, str(e)
+                self.close_ffmpeg()
+                time.sleep(RESTART_DELAY)
+
+    def status(self):
+        return {'ok': self.ok, 'err': self.err, 'written': self.written, 'skipped': self.skipped}
+
+
+if __name__ == '__main__':
+    import sys
+
+    outputs = sys.argv[1:] or ['stream_test.mkv']
+    t0 = time.perf_counter()
+
+    def test_frames():
+        t = time.perf_counter() - t0
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        frame[:, int(t * 100) % 640] = (0, 255, 255)
+        return {'front': frame, 'back': frame[:, ::-1].copy()}
+
+    def test_snapshot():
+        t = time.perf_counter() - t0
+        return {'speed': 60 + 10 * np.sin(t), 'distance': t / 100, 'lap': int(t // 5),
+                'battery': 96000, 'battery_I': 12500, 'PPV': 400.0}
+
+    encoder = StreamEncoder(outputs, ['front', 'back'], test_frames, test_snapshot).start()
+    time.sleep(10)
+    encoder.stop()
+    print(encoder.status())
@@ -0,0 +1,132 @@
+# telemetry.py
+import time
+from collections import deque
+
+
+# How many records each source keeps around for trends/debugging
+SOURCE_HISTORY = 256
+
+
+class SourceSlot:
+    """Latest value + bounded history for one data source.
+
+    A single writer (the reader for that port) calls publish(); any number of
+    readers call get(). The latest record is swapped in with one attribute
+    assignment, which is atomic in CPython, so readers never need a lock.
+    """
+
+    def __init__(self, history=SOURCE_HISTORY):
+        self.latest = None  # (timestamp, record) or None before first record
+        self.history = deque(maxlen=history)
+        self.count = 0
+
+    def publish(self, record, t=None):
+        item = (time.monotonic() if t is None else t, record)
+        self.history.append(item)
+        self.count += 1
+        self.latest = item
+
+    def get(self):
+        return self.latest
+
+    def since(self, t):
+        """History records published after t (all of them if t is None)."""
+        items = list(self.history)  # one C-level copy, safe against a concurrent append
+        if t is None:
+            return items
+        return [item for item in items if item[0] > t]
+
+    def age(self, now=None):
+        latest = self.latest
+        if latest is None:
+            return None
+        return (time.monotonic() if now is None else now) - latest[0]
+
+
+class TelemetryStore:
+    """The shared place every device publishes into, one SourceSlot per source."""
+
+    def __init__(self):
+        self.slots = {}
+
+    def slot(self, key):
+        # called when a device is added, which bring_up() does from the running
+        # acquisition loop while the tick is reading; readers only .get() from
+        # the dict and setdefault() inserts in one step, so no lock is needed
+        return self.slots.setdefault(key, SourceSlot())
+
+    def latest(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        return slot.get()
+
+    def since(self, key, t):
+        slot = self.slots.get(key)
+        if slot is None:
+            return []
+        return slot.since(t)
+
+
+# Everything DataCapture publishes each tick
+SNAPSHOT_FIELDS = (
+    'speed', 'distance', 'temperature', 'time', 'battery', 'battery_I', 'lap', 'lap_time',
+    'V', 'I', 'I_1', 'I_2', 'PPV_1', 'PPV_2', 'PPV', 'gps', 'gps_bounds', 'gps_stats', 'motor', 'age',
+)
+
+
+class Snapshot:
+    """Read-only view of one tick. Supports snapshot['speed'] like the old dict did."""
+
+    __slots__ = SNAPSHOT_FIELDS
+
+    def __init__(self, values):
+        for field in SNAPSHOT_FIELDS:
+            value = values.get(field)
+            if isinstance(value, list):
+                value = tuple(value)  # don't hand out something the next tick can mutate
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("Snapshot is read-only")
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __contains__(self, field):
+        return field in SNAPSHOT_FIELDS
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in SNAPSHOT_FIELDS}
+
+    def __repr__(self):
+        return f"Snapshot({self.as_dict()})"
+
+
+class SnapshotBuffer:
+    """Double buffer: the tick writes into `back`, readers only ever see `current`.
+
+    publish() freezes `back` into a new Snapshot and swaps it in with one
+    assignment, so a reader gets either the old tick or the new one, never a mix.
+    `previous` is the tick before `current`, for deltas.
+    """
+
+    def __init__(self, initial):
+        self.back = dict(initial)
+        self.current = Snapshot(self.back)
+        self.previous = self.current
+
+    def publish(self):
+        snapshot = Snapshot(self.back)
+        self.previous = self.current
+        self.current = snapshot
+        return snapshot
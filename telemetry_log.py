@@ -0,0 +1,171 @@
+# telemetry_log.py
+# Append-only binary telemetry log.
+#
+# Each channel group gets its own series of segment files:
+#   <directory>/<group>-<session>-<seq>.bin
+# A segment is a small header (magic, header length, JSON layout) followed by
+# fixed-width little-endian records: float64 wall-clock time, then one float64 per
+# field. Records are buffered and written + fsync'd in batches, so a power cut
+# loses at most the batch in flight. A torn record at the end of a segment is
+# ignored on readback.
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'KSCLOG1\0'
+HEADER_PREFIX = struct.Struct('<8sI')  # magic, total header length
+HEADER_ALIGN = 8
+
+BATCH_RECORDS = 30           # fsync at least every 30 records...
+BATCH_SECONDS = 5.0          # ...or every 5 s, whichever comes first
+SEGMENT_BYTES = 16 * 1024 * 1024
+
+
+def segment_header(group, fields):
+    layout = json.dumps({'group': group, 'fields': ['t', *fields]}).encode()
+    length = HEADER_PREFIX.size + len(layout)
+    length += -length % HEADER_ALIGN
+    return HEADER_PREFIX.pack(MAGIC, length) + layout.ljust(length - HEADER_PREFIX.size, b' ')
+
+
+class GroupWriter:
+    """Writes one channel group into rotating segment files."""
+
+    def __init__(self, directory, group, fields, session,
+                 batch_records=BATCH_RECORDS, batch_seconds=BATCH_SECONDS, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.group = group
+        self.fields = tuple(fields)
+        self.session = session
+        self.record = struct.Struct('<' + 'd' * (len(self.fields) + 1))
+        self.batch_records = batch_records
+        self.batch_seconds = batch_seconds
+        self.segment_bytes = segment_bytes
+        self.pending = []
+        self.last_sync = time.monotonic()
+        self.seq = 0
+        self.file = None
+        self.size = 0
+
+    def open_segment(self):
+        if self.file is not None:
+            self.file.close()
+        path = os.path.join(self.directory, f"{self.group}-{self.session}-{self.seq:04d}.bin")
+        self.seq += 1
+        self.file = open(path, 'ab')
+        header = segment_header(self.group, self.fields)
+        self.file.write(header)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size = len(header)
+
+    def append(self, t, values):
+        nan = float('nan')
+        row = [nan if values.get(f) is None else values[f] for f in self.fields]
+        self.pending.append(self.record.pack(t, *row))
+        if len(self.pending) >= self.batch_records or time.monotonic() - self.last_sync >= self.batch_seconds:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.file is None or self.size >= self.segment_bytes:
+            self.open_segment()
+        data = b''.join(self.pending)
+        self.pending = []
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size += len(data)
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class TelemetryLog:
+    """One GroupWriter per channel group. groups = {name: (field, ...)}."""
+
+    def __init__(self, directory, groups, **kwargs):
+        os.makedirs(directory, exist_ok=True)
+        session = time.strftime('%Y%m%d-%H%M%S')
+        self.writers = {name: GroupWriter(directory, name, fields, session, **kwargs)
+                        for name, fields in groups.items()}
+
+    def write(self, t, values):
+        """Log every group from one flat {field: value} mapping."""
+        for writer in self.writers.values():
+            writer.append(t, values)
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def read_segment_layout(mm):
+    """(data offset, layout) from a segment header. Raises ValueError if it is not a
+    segment or the header is incomplete."""
+    magic, length = HEADER_PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError("not a telemetry log segment")
+    if length > len(mm):
+        raise ValueError("incomplete header")
+    layout = json.loads(bytes(mm[HEADER_PREFIX.size:length]))  # JSONDecodeError is a ValueError
+    if not isinstance(layout, dict) or 'fields' not in layout:
+        raise ValueError("incomplete header")
+    return length, layout
+
+
+def read_group(directory, group):
+    """All records of a group, across sessions and segments, as a structured array."""
+    paths = sorted(glob.glob(os.path.join(directory, f"{group}-*.bin")))
+    maps, parts, dtype = [], [], None
+    try:
+        for path in paths:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size <= HEADER_PREFIX.size:
+                    continue  # crashed before the header made it to disk
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            maps.append(mm)
+            try:
+                offset, layout = read_segment_layout(mm)
+            except ValueError as e:
+                # power cut while the segment was being opened; skip it like a torn record
+                print(f"Skipping {path}: {e}")
+                continue
+            seg_dtype = np.dtype([(name, '<f8') for name in layout['fields']])
+            if dtype is None:
+                dtype = seg_dtype
+            elif seg_dtype != dtype:
+                raise ValueError(f"{path}: field layout changed from {dtype.names} to {seg_dtype.names}")
+            count = (len(mm) - offset) // seg_dtype.itemsize  # drops a torn last record
+            parts.append(np.frombuffer(mm, dtype=seg_dtype, count=count, offset=offset))
+        if not parts:
+            return np.empty(0, dtype=dtype or [('t', '<f8')])
+        return np.concatenate(parts)
+    finally:
+        del parts  # release the views before the maps go away
+        for mm in maps:
+            mm.close()
+
+
+def load_dataframe(directory, group):
+    """read_group() as a pandas DataFrame indexed by wall-clock time."""
+    import pandas as pd
+
+    records = read_group(directory, group)
+    df = pd.DataFrame(records)
+    df.index = pd.to_datetime(df.pop('t'), unit='s')
+    return df
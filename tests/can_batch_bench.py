@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas  # imported up front so its import time isn't counted as decoding
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from can_batch import decode_frames
+import motor_can
+
+# Usage: python tests/can_batch_bench.py [frames]
+# Decodes a synthetic log of random motor status frames with the per-frame
+# decoders and with can_batch, checks they agree, and times both.
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = np.random.default_rng(0)
+    ids = motor_can.BASE_ID + rng.integers(0, 4, n)
+    data = rng.integers(0, 256, (n, 8), dtype=np.uint8)
+    codes = ids >= motor_can.BASE_ID + 2
+    data[codes, 1:] = 0  # warning/error codes: a handful of distinct values
+    data[codes, 0] &= 0x0F
+    timestamps = np.arange(n) / 1000.0
+
+    t = time.perf_counter()
+    frames = decode_frames(motor_can.decoders, ids, data, timestamps)
+    batch = time.perf_counter() - t
+    print(f"batch: {n} frames in {batch:.3f} s ({n / batch / 1e6:.2f} M frames/s)")
+
+    t = time.perf_counter()
+    rows = {decoder.name: [] for decoder in motor_can.decoders.values()}
+    raw = data.tobytes()
+    for can_id, i in zip(ids.tolist(), range(0, 8 * n, 8)):
+        payload = raw[i:i + 8]
+        decoder = motor_can.decoders[can_id]
+        rows[decoder.name].append(decoder.decode(payload).as_dict())
+    per_frame = time.perf_counter() - t
+    print(f"per frame: {n} frames in {per_frame:.3f} s ({n / per_frame / 1e6:.2f} M frames/s), "
+          f"batch is {per_frame / batch:.0f}x faster")
+
+    for name, frame in frames.items():
+        expected = rows[name]
+        assert len(frame) == len(expected), name
+        for column in frame.columns:
+            assert frame[column].tolist() == [row[column] for row in expected], (name, column)
+    print("batch and per-frame results match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import os
+import struct
+import sys
+import threading
+import time
+
+import can
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from acquisition import CanFrameCache
+import motor_can
+
+# Usage: python tests/can_bench.py [seconds]
+# Drives a python-can 'virtual' bus at the frame rate a saturated 125 kbit/s bus
+# carries (8-byte standard frames) with the four motor status frames, and checks
+# the Notifier + CanFrameCache path keeps up and that reads never mix two frames.
+
+BITRATE = 125000
+FRAME_BITS = 111 + 3  # 8-byte standard frame without stuffing, plus interframe space
+FRAMES_PER_SECOND = BITRATE // FRAME_BITS
+
+FRAMES = [
+    can.Message(arbitration_id=motor_can.BASE_ID + 0, data=struct.pack('<hBhhb', 5, 0x4A, 12, 1234, 40), is_extended_id=False),
+    can.Message(arbitration_id=motor_can.BASE_ID + 1, data=struct.pack('<hhHxx', 30, 900, 1800), is_extended_id=False),
+    can.Message(arbitration_id=motor_can.BASE_ID + 2, data=struct.pack('<Q', 0x05), is_extended_id=False),
+    can.Message(arbitration_id=motor_can.BASE_ID + 3, data=struct.pack('<Q', 0), is_extended_id=False),
+]
+
+
+def send(bus, seconds, sent):
+    # paced in 10 ms bursts, like a busy bus seen through a USB adapter
+    start = time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < seconds:
+        due = int((time.perf_counter() - start) * FRAMES_PER_SECOND)
+        while n < due:
+            msg = FRAMES[n % len(FRAMES)]
+            msg.timestamp = time.time()
+            bus.send(msg)
+            n += 1
+        time.sleep(0.01)
+    sent.append(n)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    rx = can.Bus(interface='virtual', channel='can_bench')
+    tx = can.Bus(interface='virtual', channel='can_bench')
+    cache = CanFrameCache(motor_can.decoders)
+    notifier = can.Notifier(rx, [cache])
+
+    print(f"{FRAMES_PER_SECOND} frames/s ({BITRATE // 1000} kbit/s saturated) for {seconds:g} s")
+    sent = []
+    cpu = time.process_time()
+    start = time.perf_counter()
+    sender = threading.Thread(target=send, args=(tx, seconds, sent))
+    sender.start()
+
+    # what DataCapture.update_motor does every tick, here at 10 Hz
+    reads = []
+    while sender.is_alive():
+        t = time.perf_counter()
+        merged = {}
+        for _, _, _, values in cache.read():
+            merged.update(values)
+        reads.append(time.perf_counter() - t)
+        time.sleep(0.1)
+    time.sleep(0.2)  # let the notifier drain
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    notifier.stop()
+    rx.shutdown()
+    tx.shutdown()
+
+    print(f"sent {sent[0]}, decoded {cache.frames - cache.unknown - cache.errors}, "
+          f"unknown {cache.unknown}, errors {cache.errors}, torn copies redone {cache.torn}")
+    print(f"process CPU {cpu / elapsed * 100:.1f}% of one core (sender included)")
+    print(f"tick read of the cache: max {max(reads) * 1e6:.1f} us")
+
+    torn_check(seconds=min(seconds, 2.0))
+
+    # raw decode cost, no bus: how much headroom the Notifier thread has
+    n = 200000
+    t = time.perf_counter()
+    for i in range(n):
+        cache(FRAMES[i & 3])
+    per_frame = (time.perf_counter() - t) / n
+    print(f"decode + cache {per_frame * 1e6:.2f} us/frame, "
+          f"{per_frame * FRAMES_PER_SECOND * 100:.2f}% of one core at bus load")
+
+
+def torn_check(seconds):
+    # one thread decoding status_1 frames whose three fields all carry the frame
+    # number, another reading them, with thread switches as often as CPython allows:
+    # a copy mixing two frames shows up as fields that disagree
+    cache = CanFrameCache(motor_can.decoders)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    stop = []
+
+    def feed():
+        k = 0
+        while not stop:
+            k = (k + 1) & 0x7FFF
+            cache(can.Message(arbitration_id=motor_can.BASE_ID + 1, data=struct.pack('<hhH', k, k, k)))
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    reads = mixed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _, _, _, values in cache.read():
+            reads += 1
+            k = values['inv_peak_current_A']
+            if values['motor_power_W'] != k or values['abs_position_deg'] != k * 0.1:
+                mixed += 1
+    stop.append(True)
+    feeder.join()
+    sys.setswitchinterval(interval)
+    print(f"torn read check: {reads} reads of {cache.frames} frames, {mixed} mixed, "
+          f"{cache.torn} copies redone")
+    assert mixed == 0
+
+
+if __name__ == '__main__':
+    main()
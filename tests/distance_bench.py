@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import track
+from track import DistanceIntegrator, METERS_PER_DEGREE
+
+# Usage: python tests/distance_bench.py
+# Feeds DistanceIntegrator a simulated 10 Hz drive along a straight road, a few
+# fixes per tick like DataCapture does, and checks the filters: bad-HDOP fixes
+# are dropped, a one-fix spike at the end of a batch is removed once the next
+# batch shows it was one, parked jitter adds nothing, and a jump that sticks is
+# re-anchored to without counting the jump itself.
+
+RATE = 10       # fixes per second
+SPEED = 36.0    # km/h, 10 m/s
+LAT0, LON0 = 33.0346, -97.2842
+
+
+def drive(seconds, t0=0.0, north0=0.0, speed=SPEED):
+    """(t, lat, lon, hdop, speed) heading north from north0 meters past the start."""
+    n = int(seconds * RATE)
+    t = t0 + np.arange(n) / RATE
+    north = north0 + speed / 3.6 * (t - t0)
+    return [t, LAT0 + north / METERS_PER_DEGREE, np.full(n, LON0), np.full(n, 0.9), np.full(n, speed)]
+
+
+def join(*parts):
+    return [np.concatenate(columns) for columns in zip(*parts)]
+
+
+def run(fixes, batch=3):
+    d = DistanceIntegrator()
+    t, lat, lon, hdop, spd = fixes
+    for i in range(0, len(t), batch):
+        s = slice(i, i + batch)
+        d.update(t[s], lat[s], lon[s], hdop[s], spd[s])
+    return d.distance
+
+
+def check(name, distance, expected, tolerance):
+    print(f"{name:40s} {distance:8.1f} m (expected {expected:.1f} +- {tolerance:g})")
+    assert abs(distance - expected) <= tolerance, (name, distance)
+
+
+def main():
+    dt = 1 / RATE
+    clean = drive(60)
+    straight = float(track.haversine(clean[1][0], LON0, clean[1][-1], LON0))  # ~598 m on the sphere
+    check("straight, 60 s at 36 km/h", run(clean), straight, 0.5)
+
+    # every 7th fix 200 m off with a bad HDOP
+    noisy = [c.copy() for c in clean]
+    noisy[2][::7] += 200 / METERS_PER_DEGREE
+    noisy[3][::7] = track.MAX_HDOP * 2
+    check("HDOP gating", run(noisy), straight, 2)  # the first fix is one of them
+
+    # a 500 m multipath jump lasting one fix, last in its batch
+    for batch in (3, 4):
+        spiky = [c.copy() for c in clean]
+        spiky[2][batch * 10 - 1] += 500 / METERS_PER_DEGREE
+        check(f"spike at a batch boundary (batch {batch})", run(spiky, batch), straight, 0.5)
+
+    # drive 30 s, park 2 min with 2 m jitter and ~0 reported speed, drive 30 s
+    rng = np.random.default_rng(0)
+    first = drive(30)
+    n = 120 * RATE
+    parked = [first[0][-1] + dt + np.arange(n) / RATE,
+              first[1][-1] + rng.normal(0, 2, n) / METERS_PER_DEGREE,
+              LON0 + rng.normal(0, 2, n) / METERS_PER_DEGREE,
+              np.full(n, 1.2), np.full(n, 0.3)]
+    second = drive(30, parked[0][-1] + dt, 300)
+    check("parked 120 s with jitter", run(join(first, parked, second)), straight, 5)
+
+    # the receiver comes back 1 km away and stays there: the jump itself never counts.
+    # Within a batch the steps after it show it is real; fed one fix at a time, every
+    # step from the old anchor looks impossible until REANCHOR_AFTER has passed
+    jump = join(drive(30), drive(30, 30, 1300))
+    check("1 km jump that sticks", run(jump), straight - SPEED / 3.6 * dt, 0.5)
+    lost = track.REANCHOR_AFTER * SPEED / 3.6
+    check("1 km jump that sticks, one fix per batch", run(jump, 1), straight - lost, 1.5)
+
+    fixes = drive(3600)
+    t = time.perf_counter()
+    run(fixes, batch=1)
+    per_fix = (time.perf_counter() - t) / len(fixes[0])
+    print(f"{len(fixes[0])} fixes one at a time: {per_fix * 1e6:.1f} us per fix")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import gps_config
+from gps_config import configure_receiver, nmea_command, ubx_ack, UBX_CFG, UBX_SYNC
+
+# Usage: python tests/gps_config_bench.py
+# Runs configure_receiver() against scripted fake receivers (MediaTek, u-blox,
+# one that refuses, one that never answers) and checks what it settles on, what
+# it sent and how long it took.
+
+# what a receiver keeps sending while it is being configured
+NOISE = b'$GPRMC,123519,A,3302.0800,N,09717.0500,W,022.4,084.4,230394,003.1,W*7D\r\n'
+
+
+class FakeReceiver:
+    """Non-blocking serial stand-in: answers each write() as a receiver would."""
+
+    def __init__(self):
+        self.out = bytearray(NOISE)
+        self.commands = []  # everything written, one entry per write()
+
+    @property
+    def in_waiting(self):
+        return len(self.out)
+
+    def read(self, size=1):
+        chunk = bytes(self.out[:size])
+        del self.out[:size]
+        return chunk
+
+    def write(self, data):
+        self.commands.append(bytes(data))
+        self.out += NOISE + self.answer(bytes(data))
+        return len(data)
+
+    def answer(self, data):
+        return b''
+
+
+class FakeMTK(FakeReceiver):
+    # ACKs PMTK commands; rates above max_rate are refused (flag 2, "valid but failed")
+
+    def __init__(self, max_rate=10):
+        super().__init__()
+        self.max_rate = max_rate
+
+    def answer(self, data):
+        if not data.startswith(b'$PMTK'):
+            return b''  # UBX binary: not for us
+        body = data[1:data.index(b'*')].decode()
+        cmd, *args = body[4:].split(',')
+        ok = cmd != '220' or 1000 // int(args[0]) <= self.max_rate
+        return nmea_command(f'PMTK001,{cmd},{3 if ok else 2}')
+
+
+class FakeUBX(FakeReceiver):
+    # ACKs UBX-CFG messages, or NAKs all of them; ignores NMEA-style commands
+
+    def __init__(self, nak=False):
+        super().__init__()
+        self.nak = nak
+
+    def answer(self, data):
+        if not data.startswith(UBX_SYNC):
+            return b''
+        cls, msg_id = struct.unpack_from('<BB', data, 2)
+        return ubx_ack(cls, msg_id, not self.nak)
+
+
+def sent(receiver, prefix):
+    return [c for c in receiver.commands if c.startswith(prefix)]
+
+
+def run(name, receiver, expected):
+    t = time.perf_counter()
+    result = configure_receiver(receiver)
+    elapsed = time.perf_counter() - t
+    print(f"{name:22s} -> {result!r:40s} {len(receiver.commands)} commands, {elapsed:.2f} s")
+    assert result == expected, (result, expected)
+    return elapsed
+
+
+def main():
+    timeout = gps_config.ACK_TIMEOUT
+
+    receiver = FakeMTK()
+    assert run("MediaTek", receiver, 'MTK 10 Hz RMC+GGA') < timeout
+    assert receiver.commands == [nmea_command('PMTK220,100'), nmea_command(gps_config.MTK_OUTPUT_RMC_GGA)]
+
+    receiver = FakeMTK(max_rate=5)
+    run("MediaTek, 5 Hz max", receiver, 'MTK 5 Hz RMC+GGA')
+    assert sent(receiver, b'$PMTK220') == [nmea_command('PMTK220,100'), nmea_command('PMTK220,200')]
+
+    # the MTK probe goes unanswered first, so one ACK_TIMEOUT is spent on it
+    receiver = FakeUBX()
+    assert run("u-blox", receiver, 'UBX 10 Hz RMC+GGA') < 2 * timeout
+    cfg = [c for c in sent(receiver, UBX_SYNC) if c[2] == UBX_CFG]
+    assert len(cfg) == 1 + len(gps_config.UBX_NMEA_OFF), len(cfg)
+
+    receiver = FakeUBX(nak=True)
+    run("u-blox, refuses all", receiver, 'UBX default rate default sentences')
+
+    receiver = FakeReceiver()
+    elapsed = run("silent", receiver, 'defaults (no ACK)')
+    assert elapsed < 3 * timeout
+    print("all fake receivers configured as expected")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from track import LapDetector, METERS_PER_DEGREE
+from data_capture import FINISH_LINE
+
+# Usage: python tests/lap_bench.py [laps]
+# Drives a simulated loop through data_capture.FINISH_LINE at 10 Hz and checks
+# LapDetector: one direction counts and the other doesn't (both with both_ways),
+# sitting parked on the line with GPS jitter adds nothing, and feeding the same
+# fixes in batches of any size gives the same crossing times as one batch.
+
+RATE = 10          # fixes per second
+LAP_SECONDS = 60.0
+RADIUS = 150.0     # meters
+
+
+def loop(laps, reverse=False):
+    """(t, lat, lon) for `laps` circles through the middle of the line, starting
+    on the far side so each lap crosses it once, half a lap in."""
+    (lat_a, lon_a), (lat_b, lon_b) = FINISH_LINE
+    lat_m, lon_m = (lat_a + lat_b) / 2, (lon_a + lon_b) / 2
+    n = int(laps * LAP_SECONDS * RATE)
+    t = np.arange(n) / RATE
+    angle = (2 * np.pi * t / LAP_SECONDS + np.pi) * (-1 if reverse else 1)
+    r = RADIUS / METERS_PER_DEGREE
+    # circle centred one radius to the west of the line's midpoint
+    lat = lat_m + r * np.sin(angle)
+    lon = lon_m - r / np.cos(np.radians(lat_m)) * (1 - np.cos(angle))
+    return t, lat, lon
+
+
+def parked(seconds, t0, jitter=1.5, seed=0):
+    """Fixes jittering `jitter` meters around the line's midpoint."""
+    (lat_a, lon_a), (lat_b, lon_b) = FINISH_LINE
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE)
+    j = jitter / METERS_PER_DEGREE
+    return (t0 + np.arange(n) / RATE,
+            (lat_a + lat_b) / 2 + rng.normal(0, j, n),
+            (lon_a + lon_b) / 2 + rng.normal(0, j, n))
+
+
+def count(t, lat, lon, both_ways=False, batches=None):
+    laps = LapDetector(FINISH_LINE, both_ways=both_ways)
+    if batches is None:
+        laps.update(t, lat, lon)
+    else:
+        edges = np.concatenate(([0], np.cumsum(batches)))
+        for i, j in zip(edges[:-1], edges[1:]):
+            laps.update(t[i:j], lat[i:j], lon[i:j])
+    return laps
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    forward, backward = count(*loop(n)), count(*loop(n, reverse=True))
+    print(f"directed line: {forward.laps} laps one way, {backward.laps} the other")
+    assert sorted((forward.laps, backward.laps)) == [0, n]
+    for reverse in (False, True):
+        laps = count(*loop(n, reverse), both_ways=True)
+        assert laps.laps == n, laps.laps
+        assert np.allclose(laps.lap_times, LAP_SECONDS, atol=0.2), laps.lap_times
+    print(f"both_ways: {n} laps each way, lap times {LAP_SECONDS:g} s")
+
+    # drive to the line a second time, park on it for two minutes, drive on
+    t, lat, lon = loop(n, reverse=forward.laps == 0)
+    split = int(LAP_SECONDS * RATE * 1.5)
+    pt, plat, plon = parked(120, t[split])
+    t = np.concatenate((t[:split], pt, t[split:] + 120 + 1 / RATE))
+    lat = np.concatenate((lat[:split], plat, lat[split:]))
+    lon = np.concatenate((lon[:split], plon, lon[split:]))
+    for both_ways in (False, True):
+        laps = count(t, lat, lon, both_ways)
+        assert laps.laps == n, (both_ways, laps.laps)
+    print(f"parked on the line for 120 s with 1.5 m jitter: still {n} laps")
+
+    # the same fixes fed as they arrive, a few per GUI tick
+    whole = count(t, lat, lon).crossings
+    rng = np.random.default_rng(1)
+    for sizes in ([1] * len(t), rng.integers(1, 30, len(t))):
+        sizes = sizes[:np.searchsorted(np.cumsum(sizes), len(t)) + 1]
+        batched = count(t, lat, lon, batches=sizes).crossings
+        assert np.allclose(batched, whole), (batched, whole)
+    print("batches of 1 and of 1-30 fixes: same crossings as one batch")
+
+    t, lat, lon = loop(100)
+    start = time.perf_counter()
+    count(t, lat, lon, batches=[RATE // 10] * (len(t) // (RATE // 10)))
+    per_fix = (time.perf_counter() - start) / len(t)
+    print(f"{len(t)} fixes one at a time: {per_fix * 1e6:.1f} us per fix")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+
+from pynmeagps import NMEAReader
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import nmea_fast
+
+# Usage: python tests/nmea_bench.py [recorded_nmea_file]
+# The file is raw receiver output, one sentence per line (e.g. a gps.cap replayed
+# to disk, or a terminal log). Without one, a typical 1 Hz default output burst
+# (RMC, VTG, GGA, GSA, 3x GSV, GLL) is repeated.
+
+BURST = [
+    b'$GPRMC,123519,A,3302.0800,N,09717.0500,W,022.4,084.4,230394,003.1,W*7D\r\n',
+    b'$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48\r\n',
+    b'$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47\r\n',
+    b'$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39\r\n',
+    b'$GPGSV,3,1,11,03,03,111,00,04,15,270,00,06,01,010,00,13,06,292,00*74\r\n',
+    b'$GPGSV,3,2,11,14,25,170,00,16,57,208,39,18,67,296,40,19,40,246,00*74\r\n',
+    b'$GPGSV,3,3,11,22,42,067,42,24,14,311,43,27,05,244,00,,,,*4D\r\n',
+    b'$GPGLL,4916.45,N,12311.12,W,225444,A,*1D\r\n',
+]
+REPEAT = 5000
+
+
+def bench_pynmeagps(lines):
+    t = time.perf_counter()
+    fixes = 0
+    for line in lines:
+        try:
+            msg = NMEAReader.parse(line)
+        except Exception:
+            continue
+        if msg is not None and msg.msgID in ('RMC', 'GGA', 'VTG'):
+            fixes += 1
+    return time.perf_counter() - t, fixes
+
+
+def bench_fast(lines):
+    t = time.perf_counter()
+    fixes = 0
+    for line in lines:
+        if nmea_fast.sentence_type(line) not in nmea_fast.FIX_TYPES:
+            continue
+        try:
+            nmea_fast.parse(line)
+        except ValueError:
+            continue
+        fixes += 1
+    return time.perf_counter() - t, fixes
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            lines = [line + b'\n' for line in f.read().split(b'\n') if line.startswith(b'$')]
+    else:
+        lines = BURST * REPEAT
+    print(f"{len(lines)} sentences")
+    for name, bench in (('pynmeagps', bench_pynmeagps), ('nmea_fast', bench_fast)):
+        dt, fixes = bench(lines)
+        print(f"{name:10s} {dt:.3f} s  {len(lines) / dt:9.0f} sentences/s  ({fixes} RMC/GGA/VTG)")
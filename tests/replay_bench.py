@@ -0,0 +1,105 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import data_capture
+from serial_replay import CaptureWriter, Replay
+from vedirect_bench import make_block
+
+# Usage: python tests/replay_bench.py [capture_dir] [speed] [tick_seconds]
+# Without a capture_dir a synthetic one is generated (60 s, 2 charge controllers,
+# the shunt + 10 Hz GPS) and the battery values that reach the snapshot are checked.
+
+SYNTHETIC_SECONDS = 60
+RMC = b'$GPRMC,123519,A,3302.0800,N,09717.0500,W,022.4,084.4,230394,003.1,W*7D\r\n'
+
+# A BMV/SmartShunt sends two blocks a second: the live values, then the history
+SHUNT_FIELDS = [
+    ('PID', '0xA389'), ('V', '51840'), ('VS', '0'), ('I', '-12350'), ('P', '-640'),
+    ('CE', '-25400'), ('SOC', '874'), ('TTG', '1260'), ('Alarm', 'OFF'), ('Relay', 'OFF'),
+    ('AR', '0'), ('BMV', 'SmartShunt'), ('FW', '0414'), ('MON', '0'),
+]
+SHUNT_HISTORY = [('H%d' % i, str(i * 100)) for i in range(1, 19)]
+
+
+def make_capture(directory):
+    t0 = time.time()
+    block = make_block()
+    for key in ('solar1', 'solar2'):
+        writer = CaptureWriter(os.path.join(directory, key + '.cap'))
+        for s in range(SYNTHETIC_SECONDS):
+            writer.write(t0 + s, block)
+        writer.close()
+    writer = CaptureWriter(os.path.join(directory, 'battery.cap'))
+    live, history = make_block(SHUNT_FIELDS), make_block(SHUNT_HISTORY)
+    for s in range(SYNTHETIC_SECONDS):
+        writer.write(t0 + s, live)
+        writer.write(t0 + s + 0.5, history)
+    writer.close()
+    writer = CaptureWriter(os.path.join(directory, 'gps.cap'))
+    for i in range(SYNTHETIC_SECONDS * 10):
+        writer.write(t0 + i / 10, RMC)
+    writer.close()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    capture_dir = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] else None
+    synthetic = capture_dir is None
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    tick = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    if capture_dir is None:
+        capture_dir = tempfile.mkdtemp()
+        make_capture(capture_dir)
+    data_capture.LOG_DIR = tempfile.mkdtemp()
+
+    replay = Replay(capture_dir, speed=speed, paused=True)  # ports open in the background
+    print(f"replaying {capture_dir} ({replay.duration:.0f} s) at {speed}x, tick every {tick} s")
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        dc = data_capture.DataCapture(open_port=replay.open_port)
+        dc.wait_ready()
+    replay.rewind()
+    latencies = []
+    battery_ages = []
+    start = time.perf_counter()
+    while not replay.done:
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(quiet):
+            snapshot = dc.get_data()
+        if 'battery' in snapshot.age:
+            battery_ages.append(snapshot.age['battery'])
+        latencies.append(time.perf_counter() - t)
+        quiet.seek(0)
+        quiet.truncate()
+        time.sleep(max(0.0, tick - (time.perf_counter() - t)))
+    time.sleep(0.2)  # let the acquisition loop drain the tail
+    elapsed = time.perf_counter() - start
+    dc.stop()
+
+    total_bytes = sum(ser.bytes_read for ser in replay.ports.values())
+    records = {key: slot.count for key, slot in dc.engine.store.slots.items()}
+    print(f"ingested {total_bytes / 1e3:.1f} kB in {elapsed:.2f} s ({total_bytes / elapsed / 1e3:.1f} kB/s)")
+    print(f"records per source: {records}")
+    ms = [x * 1e3 for x in latencies]
+    print(f"tick latency over {len(ms)} ticks: p50 {percentile(ms, 50):.3f} ms  "
+          f"p99 {percentile(ms, 99):.3f} ms  max {max(ms):.3f} ms")
+
+    if synthetic:
+        # the history block must not hide the shunt's V and I
+        snapshot = dc.buffer.current
+        assert snapshot.battery == 51840 and snapshot.battery_I == -12350, (snapshot.battery, snapshot.battery_I)
+        assert battery_ages and max(battery_ages) < 1.5 / speed + tick, max(battery_ages)
+        print(f"shunt V/I kept across its two blocks, max age {max(battery_ages):.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import tile_cache
+from tile_cache import TileCache, TileServer, prefetch, prefetch_assets, tiles_for_bounds
+from data_capture import GPS_BOUNDS
+
+# Usage: python tests/tile_cache_bench.py [requests]
+# Prefetches the course from a stand-in tile provider and CDN on 127.0.0.1 into a
+# temporary cache, checks the limits prefetch() enforces, then serves the cache
+# with TileServer and times tile requests the way the map page makes them.
+
+# a stylesheet that points at a font and an image the way leaflet.css / font-awesome do
+CSS = {
+    '/npm/leaflet@1.9.3/dist/leaflet.css':
+        b'.leaflet-default-icon-path{background-image:url(images/marker-icon.png)}',
+    '/npm/fa@6.2.0/css/all.min.css':
+        b'@font-face{src:url(../webfonts/fa-solid-900.woff2?v=6.2.0) format("woff2"),'
+        b'url(data:font/woff2;base64,AAAA)}',
+}
+FILES = {
+    '/npm/leaflet@1.9.3/dist/leaflet.js': b'window.L = {};',
+    '/npm/leaflet@1.9.3/dist/images/marker-icon.png': b'\x89PNG icon',
+    '/npm/leaflet@1.9.3/dist/images/marker-icon-2x.png': b'\x89PNG icon 2x',
+    '/npm/leaflet@1.9.3/dist/images/marker-shadow.png': b'\x89PNG shadow',
+    '/npm/fa@6.2.0/webfonts/fa-solid-900.woff2': b'wOF2',
+}
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    # /{z}/{x}/{y}.png: a fake tile naming itself; anything else from CSS/FILES
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.requests += 1
+        try:
+            time.sleep(0.002)  # long enough for parallel fetches to overlap
+            path = self.path.split('?')[0]
+            if path in CSS:
+                self.reply('text/css', CSS[path])
+            elif path in FILES:
+                self.reply('application/octet-stream', FILES[path])
+            elif path.endswith('.png') and path.count('/') == 3:
+                self.reply('image/png', b'\x89PNG' + path.encode())
+            else:
+                self.send_response(404)
+                self.end_headers()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def reply(self, content_type, data):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_upstream():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), UpstreamHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.active = httpd.max_active = httpd.requests = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.headers.get_content_type(), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, None, None
+
+
+def refused(bounds=GPS_BOUNDS, **kwargs):
+    try:
+        tile_cache.prefetch_tiles(bounds, **kwargs)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    upstream = start_upstream()
+    base = f'http://127.0.0.1:{upstream.server_port}'
+    template = base + '/{z}/{x}/{y}.png'
+
+    # what prefetch() refuses before touching the network
+    assert refused(url_template=None)
+    assert refused(url_template='https://tile.openstreetmap.org/{z}/{x}/{y}.png')
+    assert refused(url_template=template, zooms=range(13, 19))
+    assert refused(url_template=template, margin_km=5.0)
+    assert refused(((33.1, -97.4), (33.0, -97.2)), url_template=template)  # a 20 km box: too many tiles
+    assert not refused(url_template=template)
+    print("refused: no provider, tile.openstreetmap.org, zoom 18, 5 km margin, a 20 km box")
+
+    path = os.path.join(tempfile.mkdtemp(), 'tiles.mbtiles')
+    cache = TileCache(path)
+    expected = tiles_for_bounds(GPS_BOUNDS, tile_cache.PREFETCH_ZOOMS, tile_cache.PREFETCH_MARGIN)
+    t = time.perf_counter()
+    fetched, failed = prefetch(cache, GPS_BOUNDS, url_template=template, workers=8)
+    elapsed = time.perf_counter() - t
+    assert (fetched, failed) == (len(expected), 0), (fetched, failed)
+    assert upstream.max_active <= tile_cache.MAX_WORKERS, upstream.max_active
+    print(f"prefetched {fetched} tiles in {elapsed:.2f} s, at most {upstream.max_active} connections")
+    before = upstream.requests
+    assert prefetch(cache, GPS_BOUNDS, url_template=template) == (0, 0)
+    assert upstream.requests == before
+    print("second prefetch: nothing missing, no requests")
+
+    urls = [base + '/npm/leaflet@1.9.3/dist/leaflet.js'] + [base + p for p in CSS]
+    fetched, failed = prefetch_assets(cache, urls)
+    assert (fetched, failed) == (len(CSS) + len(FILES), 0), (fetched, failed)
+    print(f"prefetched {fetched} assets (stylesheet references and Leaflet's marker images included)")
+
+    server = TileServer(cache).start()
+    z, x, y = expected[len(expected) // 2]
+    status, content_type, data = get(server.url_template.format(z=z, x=x, y=y))
+    assert (status, content_type, data) == (200, 'image/png', b'\x89PNG' + f'/{z}/{x}/{y}.png'.encode())
+    assert get(server.url_template.format(z=0, x=0, y=0))[0] == 404
+
+    # the page loads assets from the server; fonts come with a query string
+    local = server.asset_url(base + '/npm/fa@6.2.0/css/all.min.css')
+    assert local.startswith(f'http://127.0.0.1:{server.httpd.server_port}/assets/'), local
+    assert get(local)[1:] == ('text/css', CSS['/npm/fa@6.2.0/css/all.min.css'])
+    font = get(local.rsplit('/css/', 1)[0] + '/webfonts/fa-solid-900.woff2?v=6.2.0')
+    assert font[0] == 200 and font[2] == b'wOF2', font
+    missing = 'https://cdn.example.com/not-cached.js'
+    assert server.asset_url(missing) == missing  # not cached: left on the CDN
+    print("TileServer: tiles, 404s, assets and asset_url fallback ok")
+
+    t = time.perf_counter()
+    for i in range(n):
+        get(server.url_template.format(z=z, x=x, y=y))
+    per_tile = (time.perf_counter() - t) / n
+    print(f"served {n} tiles, {per_tile * 1e3:.3f} ms per tile")
+
+    server.stop()
+    cache.close()
+    upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import io
+import re
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from vedirect import VEDirectParser
+
+BLOCKS = 20000
+CHUNK = 512  # bytes per read(in_waiting), about what 19200 baud gives in 250 ms
+
+# What an MPPT charge controller sends once a second
+FIELDS = [
+    ('PID', '0xA053'), ('FW', '159'), ('SER#', 'HQ2132ABCDE'), ('V', '13250'),
+    ('I', '4200'), ('VPV', '36020'), ('PPV', '58'), ('CS', '3'), ('MPPT', '2'),
+    ('OR', '0x00000000'), ('ERR', '0'), ('LOAD', 'ON'), ('IL', '0'), ('H19', '1234'),
+    ('H20', '12'), ('H21', '180'), ('H22', '15'), ('H23', '175'), ('HSDS', '42'),
+]
+
+
+def make_block(fields=FIELDS):
+    body = b''.join(b'\r\n' + k.encode() + b'\t' + v.encode() for k, v in fields)
+    body += b'\r\nChecksum\t'
+    return body + bytes([(256 - sum(body)) & 0xFF])
+
+
+class FakeSerial(io.BytesIO):
+    @property
+    def in_waiting(self):
+        return len(self.getbuffer()) - self.tell()
+
+    def reset_input_buffer(self):
+        pass
+
+
+def old_read_serial_data(ser):
+    # the regex path from data_capture.py before the VE.Direct parser
+    data = {}
+    iterations = 0
+    while ser.in_waiting and iterations < 10:
+        line = ser.readline().decode('latin-1').strip()
+        if line:
+            parts = re.split(r'[\t,;| ]+', line)
+            if len(parts) == 2:
+                data[parts[0]] = parts[1]
+        iterations += 1
+    return data
+
+
+def bench_regex(stream):
+    ser = FakeSerial(stream)
+    t = time.perf_counter()
+    reads = 0
+    while ser.in_waiting:
+        old_read_serial_data(ser)
+        reads += 1
+    return time.perf_counter() - t, reads
+
+
+def bench_parser(stream):
+    parser = VEDirectParser()
+    t = time.perf_counter()
+    for i in range(0, len(stream), CHUNK):
+        parser.feed(stream[i:i + CHUNK])
+    return time.perf_counter() - t, parser.blocks
+
+
+if __name__ == '__main__':
+    stream = make_block() * BLOCKS
+    mb = len(stream) / 1e6
+    print(f"{BLOCKS} blocks, {mb:.1f} MB")
+
+    dt, reads = bench_regex(stream)
+    print(f"regex readline: {dt:.3f} s  {mb / dt:.1f} MB/s  ({reads} calls, no checksum, partial blocks)")
+
+    dt, blocks = bench_parser(stream)
+    print(f"VEDirectParser: {dt:.3f} s  {mb / dt:.1f} MB/s  ({blocks} checksummed blocks, {blocks / dt:.0f} blocks/s)")
@@ -0,0 +1,309 @@
+# tile_cache.py
+# Offline map tiles for the race course.
+#
+# Tiles live in one SQLite file using the MBTiles layout (tiles table, TMS row
+# numbering). prefetch() fills it for a box around the course before the race;
+# TileServer serves it on 127.0.0.1 so the map never waits on the 5G modem.
+# The JS/CSS the folium page loads (Leaflet, jQuery, Bootstrap, ...) and the
+# images/fonts those stylesheets point at are kept in the same file
+# (prefetch_assets) and served under /assets/, so the map also comes up with
+# no coverage at all.
+#
+#   python tile_cache.py [url]      # prefetch around data_capture.GPS_BOUNDS
+#
+# Only prefetch from a provider whose terms allow bulk/offline downloads (a paid
+# or self-hosted tile service). tile.openstreetmap.org does not, so it is refused.
+import math
+import mimetypes
+import os
+import re
+import sqlite3
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urlsplit
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tiles.mbtiles')
+
+# ─── CONFIG ───────────────────────────────────────────────────────────────────
+# Tile provider the team is allowed to bulk-fetch from, as a {z}/{x}/{y} URL
+# template (API key included if it needs one), and the attribution it asks for.
+# Nothing is prefetched until this is set (or a URL is given on the command line).
+UPSTREAM = None
+ATTRIBUTION = '&copy; OpenStreetMap contributors'
+USER_AGENT = 'KentSolarCarDashboard/1.0 (tile prefetch)'
+
+# Providers whose usage policy forbids bulk downloads
+FORBIDDEN_UPSTREAMS = ('tile.openstreetmap.org',)
+
+PREFETCH_ZOOMS = range(13, 18)
+PREFETCH_MARGIN = 1.0 # km around the course
+PREFETCH_WORKERS = 2  # most tile policies ask for no more than 2 connections
+FETCH_TIMEOUT = 10    # seconds per tile
+
+# Hard limits, whatever the arguments say
+MAX_ZOOM = 17
+MAX_MARGIN = 2.0         # km
+MAX_PREFETCH_TILES = 500 # per run
+MAX_WORKERS = 2
+
+# Files Leaflet loads next to leaflet.css that no stylesheet names
+LEAFLET_EXTRAS = ('images/marker-icon-2x.png', 'images/marker-shadow.png')
+
+# url(...) references inside a stylesheet
+CSS_URL = re.compile(rb'''url\(\s*['"]?([^'")]+?)['"]?\s*\)''')
+
+
+def tile_xy(lat, lon, z):
+    # standard slippy-map tile containing lat/lon at zoom z
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bounds(bounds, zooms, margin_km=0.0):
+    """Every (z, x, y) covering bounds ((lat, lon), (lat, lon)) grown by margin_km."""
+    (lat_a, lon_a), (lat_b, lon_b) = bounds
+    dlat = margin_km / 111.32
+    dlon = margin_km / (111.32 * math.cos(math.radians((lat_a + lat_b) / 2)))
+    north, south = max(lat_a, lat_b) + dlat, min(lat_a, lat_b) - dlat
+    west, east = min(lon_a, lon_b) - dlon, max(lon_a, lon_b) + dlon
+    tiles = []
+    for z in zooms:
+        x0, y0 = tile_xy(north, west, z)
+        x1, y1 = tile_xy(south, east, z)
+        tiles.extend((z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+    return tiles
+
+
+class TileCache:
+    def __init__(self, path=CACHE_PATH):
+        # shared between the server threads, so one connection behind a lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, "
+                              "tile_row INTEGER, tile_data BLOB, PRIMARY KEY (zoom_level, tile_column, tile_row))")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS assets (url TEXT PRIMARY KEY, content_type TEXT, data BLOB)")
+            self.conn.execute("INSERT OR IGNORE INTO metadata VALUES ('format', 'png')")
+
+    @staticmethod
+    def tms_row(z, y):
+        return (1 << z) - 1 - y  # MBTiles counts rows from the bottom
+
+    def get(self, z, x, y):
+        with self.lock:
+            row = self.conn.execute("SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                                    (z, x, self.tms_row(z, y))).fetchone()
+        return row[0] if row else None
+
+    def has(self, z, x, y):
+        return self.get(z, x, y) is not None
+
+    def put_many(self, tiles):
+        """tiles: [(z, x, y, data), ...] in one transaction."""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                                  [(z, x, self.tms_row(z, y), data) for z, x, y, data in tiles])
+
+    def get_asset(self, url):
+        """(content type, data) for a URL (scheme and query string ignored), or None."""
+        with self.lock:
+            return self.conn.execute("SELECT content_type, data FROM assets WHERE url=?",
+                                     (asset_key(url),)).fetchone()
+
+    def put_asset(self, url, content_type, data):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO assets VALUES (?, ?, ?)", (asset_key(url), content_type, data))
+
+    def close(self):
+        self.conn.close()
+
+
+def asset_key(url):
+    # host + path: fonts are often asked for as ...woff2?v=6.2.0 or ...eot?#iefix
+    parts = urlsplit(url)
+    return parts.netloc + parts.path
+
+
+def map_asset_urls():
+    """The JS and CSS URLs every folium map page loads."""
+    import folium
+
+    return [url for _, url in folium.Map.default_js + folium.Map.default_css]
+
+
+def fetch_tile(url_template, z, x, y):
+    request = urllib.request.Request(url_template.format(z=z, x=x, y=y), headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def prefetch_tiles(bounds, zooms=PREFETCH_ZOOMS, margin_km=PREFETCH_MARGIN, url_template=UPSTREAM):
+    """The tiles prefetch() would download. Raises ValueError when no provider is
+    configured, the provider forbids bulk downloads, or the area is over the limits above.
+    """
+    if url_template is None:
+        raise ValueError("No tile provider configured, set UPSTREAM in tile_cache.py or pass a URL")
+    if any(host in url_template for host in FORBIDDEN_UPSTREAMS):
+        raise ValueError(f"{url_template} does not allow bulk tile downloads")
+    if max(zooms) > MAX_ZOOM:
+        raise ValueError(f"Zoom {max(zooms)} is above the limit of {MAX_ZOOM}")
+    if margin_km > MAX_MARGIN:
+        raise ValueError(f"Margin {margin_km:g} km is above the limit of {MAX_MARGIN:g} km")
+    tiles = tiles_for_bounds(bounds, zooms, margin_km)
+    if len(tiles) > MAX_PREFETCH_TILES:
+        raise ValueError(f"{len(tiles)} tiles is over the limit of {MAX_PREFETCH_TILES}")
+    return tiles
+
+
+def prefetch(cache, bounds, zooms=PREFETCH_ZOOMS, margin_km=PREFETCH_MARGIN,
+             url_template=UPSTREAM, workers=PREFETCH_WORKERS):
+    """Download every missing tile for the area. Returns (fetched, failed).
+
+    Raises ValueError like prefetch_tiles().
+    """
+    tiles = prefetch_tiles(bounds, zooms, margin_km, url_template)
+    workers = min(workers, MAX_WORKERS)
+    missing = [t for t in tiles if not cache.has(*t)]
+    fetched, failed = 0, 0
+
+    def fetch(tile):
+        try:
+            return tile, fetch_tile(url_template, *tile)
+        except Exception as e:
+            print(f"Failed to fetch tile {tile}: {e}")
+            return tile, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        for tile, data in pool.map(fetch, missing):
+            if data is None:
+                failed += 1
+                continue
+            batch.append((*tile, data))
+            fetched += 1
+            if len(batch) >= 100:
+                cache.put_many(batch)
+                batch = []
+        cache.put_many(batch)
+    return fetched, failed
+
+
+def prefetch_assets(cache, urls=None):
+    """Download the map page's JS/CSS and everything their stylesheets reference.
+
+    urls defaults to map_asset_urls(). Returns (fetched, failed).
+    """
+    queue = list(map_asset_urls() if urls is None else urls)
+    seen = set()
+    fetched, failed = 0, 0
+    while queue:
+        url = queue.pop(0)
+        if asset_key(url) in seen or urlsplit(url).scheme not in ('http', 'https'):
+            continue
+        seen.add(asset_key(url))
+        try:
+            request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+            with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+                data = response.read()
+                content_type = response.headers.get_content_type()
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            failed += 1
+            continue
+        if content_type in ('application/octet-stream', 'text/plain'):
+            content_type = mimetypes.guess_type(urlsplit(url).path)[0] or content_type
+        cache.put_asset(url, content_type, data)
+        fetched += 1
+        if urlsplit(url).path.endswith('.css'):
+            refs = [ref.decode('latin-1') for ref in CSS_URL.findall(data)]
+            if urlsplit(url).path.endswith('/leaflet.css'):
+                refs += LEAFLET_EXTRAS
+            queue.extend(urljoin(url, ref) for ref in refs if not ref.startswith('data:'))
+    return fetched, failed
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    # GET /{z}/{x}/{y}.png, straight out of server.cache
+    # GET /assets/<host>/<path>, the cached copy of https://<host>/<path>
+
+    def do_GET(self):
+        if self.path.startswith('/assets/'):
+            asset = self.server.cache.get_asset('//' + self.path[len('/assets/'):])
+            if asset is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_data(*asset)
+            return
+        try:
+            z, x, y = self.path.strip('/').split('.')[0].split('/')
+            data = self.server.cache.get(int(z), int(x), int(y))
+        except ValueError:
+            data = None
+        if data is None:
+            self.send_response(404)  # Leaflet just leaves the square blank
+            self.end_headers()
+            return
+        self.send_data('image/png', data)
+
+    def send_data(self, content_type, data):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'max-age=86400')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # one line per tile is just noise
+
+
+class TileServer:
+    """Serves a TileCache on 127.0.0.1 from a background thread."""
+
+    def __init__(self, cache, port=0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), TileRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.cache = cache
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="tile-server", daemon=True)
+
+    @property
+    def url_template(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}/{{z}}/{{x}}/{{y}}.png'
+
+    def asset_url(self, url):
+        """Where the map page should load url from: here if it is cached, else the CDN."""
+        if self.httpd.cache.get_asset(url) is None:
+            return url
+        return f'http://127.0.0.1:{self.httpd.server_port}/assets/' + url.split('://', 1)[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    from data_capture import GPS_BOUNDS
+
+    upstream = sys.argv[1] if len(sys.argv) > 1 else UPSTREAM
+    try:
+        prefetch_tiles(GPS_BOUNDS, url_template=upstream)
+    except ValueError as e:
+        sys.exit(f"Not prefetching: {e}")  # before an empty cache file makes the map go blank
+    cache = TileCache()
+    fetched, failed = prefetch(cache, GPS_BOUNDS, url_template=upstream)
+    print(f"Fetched {fetched} tiles, {failed} failed, cache at {CACHE_PATH}")
+    fetched, failed = prefetch_assets(cache)
+    print(f"Fetched {fetched} map page assets, {failed} failed")
+    cache.close()
@@ -0,0 +1,190 @@
+# track.py
+# Lap counting from GPS fixes.
+import numpy as np
+
+# Reject a second crossing sooner than this after the last one (GPS jitter on the line)
+MIN_LAP_TIME = 20.0 # seconds
+
+# After a crossing, the car has to get this far from the line before the next one
+# counts, so sitting parked on the line never adds laps
+ARM_DISTANCE = 50.0 # meters
+
+METERS_PER_DEGREE = 111320.0
+
+
+def to_plane(lat, lon, lat0):
+    # local equirectangular projection; plenty for a line a few metres long
+    return np.asarray(lon) * np.cos(np.radians(lat0)), np.asarray(lat)
+
+
+class LapDetector:
+    """Counts laps as directed crossings of the finish line.
+
+    finish_line is ((lat_a, lon_a), (lat_b, lon_b)). A crossing counts when the car
+    passes from the left of the line to the right of it, as seen standing at A
+    looking towards B; swap A and B to flip the direction. With both_ways, a
+    crossing in either direction counts (for a line whose direction is not known).
+    The crossing time is interpolated between the two fixes on either side of the line.
+    """
+
+    def __init__(self, finish_line, min_lap_time=MIN_LAP_TIME, arm_distance=ARM_DISTANCE, both_ways=False):
+        (lat_a, lon_a), (lat_b, lon_b) = finish_line
+        self.lat0 = (lat_a + lat_b) / 2
+        ax, ay = to_plane(lat_a, lon_a, self.lat0)
+        bx, by = to_plane(lat_b, lon_b, self.lat0)
+        self.a = (float(ax), float(ay))
+        self.e = (float(bx - ax), float(by - ay))
+        self.mid = (self.a[0] + self.e[0] / 2, self.a[1] + self.e[1] / 2)
+        self.min_lap_time = min_lap_time
+        self.arm_distance = arm_distance / METERS_PER_DEGREE
+        self.both_ways = both_ways
+        self.armed = True      # False right after a crossing until the car drives away
+        self.prev = None       # last fix of the previous batch: (t, x, y)
+        self.crossings = []    # time of every counted crossing
+
+    @property
+    def laps(self):
+        return len(self.crossings)
+
+    @property
+    def lap_times(self):
+        return [float(dt) for dt in np.diff(self.crossings)]
+
+    def update(self, times, lats, lons):
+        """Feed a batch of fixes in time order. Returns the new crossing times."""
+        if not len(times):
+            return []
+        x, y = to_plane(lats, lons, self.lat0)
+        t = np.asarray(times, dtype=np.float64)
+        if self.prev is not None:
+            t = np.concatenate(([self.prev[0]], t))
+            x = np.concatenate(([self.prev[1]], x))
+            y = np.concatenate(([self.prev[2]], y))
+        self.prev = (t[-1], x[-1], y[-1])
+        if len(t) < 2:
+            return []
+
+        ax, ay = self.a
+        ex, ey = self.e
+        # which side of A->B each fix is on: > 0 left, < 0 right
+        side = ex * (y - ay) - ey * (x - ax)
+        s0, s1 = side[:-1], side[1:]
+        crossed = (s0 > 0) & (s1 <= 0)
+        if self.both_ways:
+            crossed |= (s0 < 0) & (s1 >= 0)
+        candidates = np.nonzero(crossed)[0]
+        far = np.hypot(x - self.mid[0], y - self.mid[1]) > self.arm_distance
+
+        new = []
+        scan_from = 0
+        for i in candidates:
+            self.armed = self.armed or bool(far[scan_from:i + 1].any())
+            if not self.armed:
+                continue
+            # where along the fix step (f) and along the finish line (u) they meet
+            dx, dy = x[i + 1] - x[i], y[i + 1] - y[i]
+            denom = dx * ey - dy * ex
+            if denom == 0:
+                continue
+            px, py = ax - x[i], ay - y[i]
+            f = (px * ey - py * ex) / denom
+            u = (px * dy - py * dx) / denom
+            if not 0.0 <= u <= 1.0:
+                continue  # crossed the extension of the line, not the line itself
+            crossing = t[i] + f * (t[i + 1] - t[i])
+            if self.crossings and crossing - self.crossings[-1] < self.min_lap_time:
+                continue
+            self.crossings.append(float(crossing))
+            new.append(float(crossing))
+            self.armed = False
+            scan_from = i + 1
+        self.armed = self.armed or bool(far[scan_from:].any())
+        return new
+
+
+# Distance integration
+EARTH_RADIUS = 6371000.0 # meters
+MAX_HDOP = 5.0           # fixes worse than this are ignored
+MAX_SPEED = 150.0        # km/h; anything implying more is a multipath jump
+STOP_SPEED = 2.0         # km/h; below this the car is parked and jitter is not distance
+REANCHOR_AFTER = 5.0     # seconds of rejected fixes before trusting the new position
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters, element-wise over arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+class DistanceIntegrator:
+    """Distance driven, from GPS fixes fed in batches as they arrive.
+
+    Fixes with a bad HDOP are dropped, single-fix spikes (a jump out and back
+    that would need more than MAX_SPEED) are removed, and steps taken while the
+    receiver reports less than STOP_SPEED are not counted.
+    """
+
+    def __init__(self):
+        self.distance = 0.0   # meters
+        self.anchor = None    # last accepted fix: (t, lat, lon, speed)
+        self.rejected_since = None
+
+    def update(self, times, lats, lons, hdops=None, speeds=None):
+        """Add a batch of fixes in time order. Returns the meters added."""
+        n = len(times)
+        if not n:
+            return 0.0
+        nan = np.full(n, np.nan)
+        t = np.asarray(times, dtype=np.float64)
+        lat = np.asarray(lats, dtype=np.float64)
+        lon = np.asarray(lons, dtype=np.float64)
+        hdop = nan if hdops is None else np.array(hdops, dtype=np.float64)
+        spd = nan if speeds is None else np.array(speeds, dtype=np.float64)
+
+        keep = ~(hdop > MAX_HDOP)  # unknown HDOP (NaN) is kept
+        t, lat, lon, spd = t[keep], lat[keep], lon[keep], spd[keep]
+        if self.anchor is not None:
+            t, lat, lon, spd = (np.concatenate(([a], x)) for a, x in zip(self.anchor, (t, lat, lon, spd)))
+        if len(t) < 2:
+            if len(t):
+                self.anchor = (t[-1], lat[-1], lon[-1], spd[-1])
+            return 0.0
+
+        d, bad = self._steps(t, lat, lon)
+        # a spike is a fix whose step in and step out are both impossible
+        spike = np.zeros(len(t), dtype=bool)
+        spike[1:-1] = bad[:-1] & bad[1:]
+        if spike.any():
+            t, lat, lon, spd = t[~spike], lat[~spike], lon[~spike], spd[~spike]
+            d, bad = self._steps(t, lat, lon)
+
+        # moving if the receiver says so, or (no speed reported) the step itself does
+        implied = d / np.maximum(np.diff(t), 1e-9) * 3.6
+        end_speed = np.where(np.isnan(spd[1:]), implied, spd[1:])
+        added = float(d[~bad & (end_speed >= STOP_SPEED)].sum())
+        self.distance += added
+
+        if bad[-1]:
+            # the newest fix is an unconfirmed jump: keep the old anchor for now,
+            # unless the jump has stuck around long enough to be real
+            if self.rejected_since is None:
+                self.rejected_since = t[-1]
+            if t[-1] - self.rejected_since >= REANCHOR_AFTER:
+                self.anchor = (t[-1], lat[-1], lon[-1], spd[-1])
+                self.rejected_since = None
+            else:
+                i = len(t) - 2
+                self.anchor = (t[i], lat[i], lon[i], spd[i])
+        else:
+            self.anchor = (t[-1], lat[-1], lon[-1], spd[-1])
+            self.rejected_since = None
+        return added
+
+    @staticmethod
+    def _steps(t, lat, lon):
+        d = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        dt = np.diff(t)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bad = (dt <= 0) | (d / dt * 3.6 > MAX_SPEED)
+        return d, bad
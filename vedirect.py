@@ -0,0 +1,88 @@
+# vedirect.py
+# Streaming parser for the Victron VE.Direct text protocol (charge controllers + shunt).
+#
+# A block is a run of "\r\n<label>\t<value>" fields closed by "\r\nChecksum\t<byte>".
+# The checksum byte is chosen so that every byte of the block, checksum included,
+# adds up to 0 mod 256. The checksum byte can be anything (even \r, \n or ':'), so
+# blocks are cut right after it instead of on line endings.
+import re
+
+CHECKSUM_LABEL = b'Checksum\t'
+
+# Anything longer than this without a Checksum field is line noise, drop it
+MAX_BLOCK = 2048 # bytes
+
+# HEX protocol frames (":<hex>\n") can be interleaved with the text blocks and
+# are not part of the checksum
+HEX_FRAME = re.compile(rb':[0-9A-Fa-f]+\n')
+
+# Fields that are text even when they look numeric
+TEXT_FIELDS = {'PID', 'FW', 'FWE', 'SER#', 'LOAD', 'Relay', 'Alarm', 'BMV', 'MON', 'HSDS'}
+
+# Fields that are reported as "---" when the device has no value for them
+NO_VALUE = '---'
+
+
+def parse_value(label, value):
+    if label in TEXT_FIELDS:
+        return value
+    if value == NO_VALUE:
+        return None
+    try:
+        if value.startswith('0x'):
+            return int(value, 16)  # OR, AR, ... bit fields
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_block(block):
+    """Turn the bytes of one checksummed block into {label: typed value}."""
+    record = {}
+    for line in block.decode('latin-1').split('\r\n'):
+        label, sep, value = line.partition('\t')
+        if not sep or label == 'Checksum':
+            continue
+        record[label] = parse_value(label, value)
+    return record
+
+
+class VEDirectParser:
+    """Feed it raw bytes in any chunk size, get back one dict per valid block.
+
+    Integers stay in the device units (mV, mA, W, 0.01 kWh for H19-H22, ...).
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.blocks = 0        # blocks that passed the checksum
+        self.bad_checksum = 0  # blocks that were thrown away
+        self.dropped_bytes = 0 # noise discarded while looking for a block
+
+    def feed(self, chunk):
+        buf = self.buf
+        buf += chunk
+        records = []
+        start = 0
+        while True:
+            i = buf.find(CHECKSUM_LABEL, start)
+            if i < 0:
+                break
+            end = i + len(CHECKSUM_LABEL) + 1  # include the checksum byte
+            if end > len(buf):
+                break  # checksum byte not here yet
+            block = bytes(buf[start:end])
+            if b':' in block:
+                block = HEX_FRAME.sub(b'', block)
+            if sum(block) & 0xFF == 0:
+                records.append(parse_block(block[:-1]))
+                self.blocks += 1
+            else:
+                # also what happens to the partial block we join mid-stream on
+                self.bad_checksum += 1
+            start = end
+        del buf[:start]
+        if len(buf) > MAX_BLOCK:
+            self.dropped_bytes += len(buf)
+            buf.clear()
+        return records